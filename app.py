@@ -1,37 +1,154 @@
 import json
-from flask import Flask, Response
-from model import download_data, format_data, train_model, get_inference
-from config import model_file_path, TOKEN, TIMEFRAME, TRAINING_DAYS, REGION, DATA_PROVIDER
+import os
+import time
+from flask import Flask, Response, g, request
+from model import compute_inference, get_batch_inference
+from registry import model_registries
+from live_cache import live_data_cache
+from jobs import submit_update_job, job_status
+from scheduler import PrecomputeScheduler
+from stream import market_stream
+from topics import TOPICS, find_topic
+import metrics
+from metrics import span
+from config import TIMEFRAME, REGION, DATA_PROVIDER, SERVING_MODE, LIVE_DATA_SOURCE
 
 app = Flask(__name__)
+precompute = PrecomputeScheduler(lambda: compute_inference(REGION, DATA_PROVIDER))
 
-def update_data():
-    print("Starting data update process...")
-    files_btc = download_data("BTC", TRAINING_DAYS, REGION, DATA_PROVIDER)
-    files_eth = download_data("ETH", TRAINING_DAYS, REGION, DATA_PROVIDER)
-    format_data(files_btc, files_eth, DATA_PROVIDER)
-    train_model(TIMEFRAME)
+def start_background_tasks():
+    """Start the market stream and precompute threads this process serves from."""
+    if LIVE_DATA_SOURCE == "stream" and DATA_PROVIDER == "binance":
+        market_stream.ensure_started()
+    if SERVING_MODE == "precompute":
+        precompute.ensure_started()
+
+def preload_models():
+    """Load every topic's artifact now instead of on its first request."""
+    for key, registry in model_registries.items():
+        if registry.has_artifact():
+            registry.get()
+        else:
+            print(f"No model artifact for {key} yet")
+
+def start_initial_update():
+    """Train in the background when a topic has nothing to serve yet; its requests get a 503 until then."""
+    missing = [key for key, registry in model_registries.items() if not registry.has_artifact()]
+    if missing:
+        print(f"No model artifact for {', '.join(missing)} yet, training in the background")
+        submit_update_job()
+
+def not_trained(e):
+    return Response(json.dumps({"error": f"Model not trained yet: {str(e)}"}), status=503, mimetype='application/json')
+
+# Threads are started by the serving process only, from __main__ below or gunicorn's post_fork:
+# the spawned training process imports this module too (as __mp_main__ under `python app.py`)
+if os.getenv("GUNICORN_PRELOAD"):
+    # Imported once by the gunicorn master (see gunicorn_conf.py): models loaded here are
+    # shared copy-on-write by the forked workers, which start their own threads after the fork
+    preload_models()
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    # Streamed batch bodies are timed by their "serialize" span, this covers up to the first byte
+    metrics.request_seconds.observe(time.perf_counter() - g.request_start, request.url_rule.rule if request.url_rule else "unmatched", str(response.status_code))
+    metrics.registry.flush()
+    return response
 
 @app.route("/inference/<string:token>")
 def generate_inference(token):
-    if not token or token.upper() != TOKEN:
+    # ?horizon= picks among several topics of one token; without it the first configured one answers
+    topic = find_topic(token, request.args.get("horizon")) if token else None
+    if topic is None:
         error_msg = "Token is required" if not token else "Token not supported"
         return Response(json.dumps({"error": error_msg}), status=400, mimetype='application/json')
+    if SERVING_MODE == "precompute":
+        precompute.ensure_started()
+        latest = precompute.latest()
+        if latest is not None and topic.key in latest.value:
+            with span("serialize"):
+                body = str(latest.value[topic.key])
+            return Response(body, status=200)
+    try:
+        # In precompute mode the one fetch and feature vector predicts every topic for the slot,
+        # otherwise only this one; only this topic's own error (503 while untrained) reaches the client
+        topics = TOPICS if SERVING_MODE == "precompute" else [topic]
+        inference, as_of = compute_inference(REGION, DATA_PROVIDER, topics, required=topic)
+        if SERVING_MODE == "precompute":
+            precompute.publish(inference, as_of)
+        with span("serialize"):
+            body = str(inference[topic.key])
+        return Response(body, status=200)
+    except FileNotFoundError as e:
+        return not_trained(e)
+    except Exception as e:
+        return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
+
+@app.route("/inference/batch", methods=["POST"])
+def generate_batch_inference():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return Response(json.dumps({"error": "JSON object body is required"}), status=400, mimetype='application/json')
+    token, horizon = body.get("token", TOPICS[0].token), body.get("horizon")
+    topic = find_topic(token, horizon) if isinstance(token, str) and isinstance(horizon, (str, type(None))) else None
+    if topic is None:
+        return Response(json.dumps({"error": "Token not supported"}), status=400, mimetype='application/json')
     try:
-        inference = get_inference(token.upper(), TIMEFRAME, REGION, DATA_PROVIDER)
-        return Response(str(inference), status=200)
+        timestamps, predictions = get_batch_inference(TIMEFRAME, REGION, DATA_PROVIDER, last=body.get("last"), timestamps=body.get("timestamps"), topic=topic)
+    except FileNotFoundError as e:
+        return not_trained(e)
+    except (ValueError, LookupError) as e:
+        return Response(json.dumps({"error": str(e)}), status=400, mimetype='application/json')
     except Exception as e:
         return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
 
+    def stream():
+        # Rows are written as they are serialized so large backfills start arriving immediately
+        with span("serialize"):
+            yield "["
+            for i, (timestamp, prediction) in enumerate(zip(timestamps, predictions)):
+                row = json.dumps({"timestamp": timestamp.isoformat(), "prediction": float(prediction)})
+                yield row if i == 0 else f",{row}"
+            yield "]"
+
+    return Response(stream(), status=200, mimetype='application/json')
+
+@app.route("/status")
+def status():
+    status = {
+        "models": {key: registry.info() for key, registry in model_registries.items()},
+        "live_cache": live_data_cache.stats(),
+        "precompute": precompute.stats() if SERVING_MODE == "precompute" else None,
+        "stream": market_stream.stats() if LIVE_DATA_SOURCE == "stream" else None,
+    }
+    return Response(json.dumps(status), status=200, mimetype='application/json')
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.registry.render(), status=200, mimetype="text/plain; version=0.0.4")
+
 @app.route("/update")
 def update():
     try:
-        update_data()
-        return "0"
+        job_id = submit_update_job()
+        return Response(json.dumps(job_status(job_id)), status=202, mimetype='application/json')
     except Exception as e:
         print(f"Update failed: {str(e)}")
-        return "1"
+        return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
+
+@app.route("/update/status/<string:job_id>")
+def update_status(job_id):
+    status = job_status(job_id)
+    if status is None:
+        return Response(json.dumps({"error": "Unknown job"}), status=404, mimetype='application/json')
+    return Response(json.dumps(status), status=200, mimetype='application/json')
 
 if __name__ == "__main__":
-    update_data()
+    start_background_tasks()
+    # The last trained artifacts are served right away; the data refresh and retrain run in the training process
+    submit_update_job()
     app.run(host="0.0.0.0", port=8000)
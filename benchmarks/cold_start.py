@@ -0,0 +1,124 @@
+"""Time from starting the server to its first successful /inference.
+
+Trains each of `--models` once on synthetic data from
+`benchmarks.fake_exchange`, then starts the node `--runs` times in each serving
+setup of `benchmarks.loadtest` and measures how long the first 200 answer to
+`/inference/<token>` takes, for the array artifacts (predictor.json) and, with
+those files removed from a copy of the data directory, for the pickles the
+registry falls back to. A last run starts gunicorn on an empty data directory
+and reports when it first answers (503 until a model is trained) and when the
+background training lets it answer 200:
+
+    python -m benchmarks.cold_start --models KNN,LinearRegression --runs 5
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+import numpy as np
+from benchmarks.download import publish
+from benchmarks.fake_exchange import FakeExchange, PRICES
+from benchmarks.loadtest import free_port, server_command
+from benchmarks.pipeline import node_env
+from predictors import PREDICTOR_FILE
+
+TOKEN = "BTC"
+
+
+async def first_answers(url, timeout):
+    """Seconds until the first HTTP answer of any status, and until the first 200."""
+    start = time.perf_counter()
+    first_answer = None
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+        while time.perf_counter() - start < timeout:
+            with contextlib.suppress(aiohttp.ClientError):
+                async with session.get(url) as response:
+                    await response.read()
+                    first_answer = first_answer or time.perf_counter() - start
+                    if response.status == 200:
+                        return first_answer, time.perf_counter() - start
+            await asyncio.sleep(0.02)
+    raise TimeoutError(f"{url} did not answer 200 within {timeout}s")
+
+
+def start_and_measure(setup, env, base_path, timeout):
+    port = free_port()
+    with open(os.path.join(base_path, f"{setup}.log"), "a") as log:
+        server = subprocess.Popen(server_command(setup, port), env=env, cwd=base_path, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            return asyncio.run(first_answers(f"http://127.0.0.1:{port}/inference/{TOKEN}", timeout))
+        finally:
+            server.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                server.wait(30)
+            if server.poll() is None:
+                server.kill()
+
+
+def remove_array_artifacts(models_root):
+    for directory, _, files in os.walk(models_root):
+        if PREDICTOR_FILE in files:
+            for name in files:
+                if name.startswith("predictor."):
+                    os.remove(os.path.join(directory, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="KNN,LinearRegression,SVR")
+    parser.add_argument("--setups", default="dev,gunicorn", help="Comma-separated subset of dev,gthread,gunicorn")
+    parser.add_argument("--days", type=int, default=3, help="Days of 1m training data")
+    parser.add_argument("--runs", type=int, default=3, help="Restarts measured per model, setup and artifact format")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    setups = [setup.strip() for setup in args.setups.split(",")]
+    if importlib.util.find_spec("gunicorn") is None:
+        print("gunicorn is not installed, only the dev server is measured")
+        setups = [setup for setup in setups if setup == "dev"]
+
+    root = tempfile.mkdtemp(prefix="cold-start-")
+    try:
+        served = os.path.join(root, "served", "data")
+        publish(args.days, served, {pair: PRICES[pair] for pair in ["BTCUSDT", "ETHUSDT"]})
+        exchange = FakeExchange(data_dir=served)
+        data_url = exchange.start()
+
+        print(f"{'model':<17}{'setup':<10}{'artifacts':<11}{'first 200, median of ' + str(args.runs):>28}")
+        for model in args.models.split(","):
+            base_path = os.path.join(root, model, "arrays")
+            os.makedirs(base_path)
+            env = node_env(base_path, model, [TOKEN, "ETH"], args.days, data_url, LIVE_DATA_TTL="0")
+            env.pop("GUNICORN_PRELOAD", None)
+            subprocess.run([sys.executable, "-c", "from model import update_data; update_data()"],
+                           env=env, cwd=base_path, check=True, stdout=subprocess.DEVNULL)
+            pickle_path = os.path.join(root, model, "pickle")
+            shutil.copytree(base_path, pickle_path)
+            remove_array_artifacts(os.path.join(pickle_path, "data", "models"))
+            for setup in setups:
+                for artifacts, path in [("arrays", base_path), ("pickle", pickle_path)]:
+                    env = dict(env, APP_BASE_PATH=path)
+                    seconds = [start_and_measure(setup, env, path, args.timeout)[1] for _ in range(args.runs)]
+                    print(f"{model:<17}{setup:<10}{artifacts:<11}{np.median(seconds):>27.3f}s")
+
+        if "gunicorn" in setups:
+            base_path = os.path.join(root, "empty")
+            os.makedirs(base_path)
+            env = node_env(base_path, "LinearRegression", [TOKEN, "ETH"], args.days, data_url, LIVE_DATA_TTL="0")
+            env.pop("GUNICORN_PRELOAD", None)
+            first_answer, first_ok = start_and_measure("gunicorn", env, base_path, args.timeout)
+            print(f"\nEmpty data directory, gunicorn: first answer after {first_answer:.3f}s, first 200 after {first_ok:.3f}s")
+        exchange.stop()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Checks and times the historical downloader against a local file server.
+
+Writes synthetic Binance daily zips with `.CHECKSUM` files, serves them with
+`benchmarks.fake_exchange` and runs `download_binance_daily_data` against it:
+a fresh download, a resume of an interrupted part file, a truncated zip left by
+an older version, a corrupted checksum and a missing day. Reports throughput
+and peak memory. Needs no network access:
+
+    python -m benchmarks.download --days 60
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import resource
+import shutil
+import tempfile
+import time
+from updater import download_binance_daily_data
+from benchmarks.fake_exchange import FakeExchange
+from benchmarks.synthetic import write_daily_zips
+
+PAIRS = {"BTCUSDT": 30000.0, "ETHUSDT": 2000.0}
+
+
+def sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def publish(days, root, pairs=PAIRS):
+    """Lay the zips out like data.binance.vision, each with its checksum file."""
+    sources = {}
+    for n, (pair, price) in enumerate(pairs.items()):
+        path = os.path.join(root, "spot", "daily", "klines", pair, "1m")
+        for file_name in write_daily_zips(pair, days, path, price=price, seed=n):
+            with open(f"{file_name}.CHECKSUM", "w") as f:
+                f.write(f"{sha256(file_name)}  {os.path.basename(file_name)}\n")
+            sources[os.path.basename(file_name)] = file_name
+    return sources
+
+
+def run(pair, days, download_path, data_url):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return download_binance_daily_data(pair, days, None, download_path, data_url=data_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="download-bench-")
+    served = os.path.join(root, "served")
+    download_path = os.path.join(root, "downloaded")
+    try:
+        sources = publish(args.days, os.path.join(served, "data"))
+        exchange = FakeExchange(data_dir=os.path.join(served, "data"))
+        data_url = exchange.start()
+
+        # Fresh download; the newest day is not published yet, like today's zip on Binance
+        start = time.perf_counter()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        reports = {pair: run(pair, args.days + 1, download_path, data_url) for pair in PAIRS}
+        seconds = time.perf_counter() - start
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        for name, source in sources.items():
+            assert sha256(os.path.join(download_path, name)) == sha256(source), name
+        total = sum(report.bytes for report in reports.values())
+        print(f"Fresh: {sum(len(r.files) for r in reports.values())} files, {total / 2**20:.1f} MiB in {seconds:.2f}s "
+              f"({total / seconds / 2**20:.1f} MiB/s), {sum(r.count('missing') for r in reports.values())} missing, "
+              f"peak RSS grew {rss_growth / 1024:.1f} MiB")
+
+        names = sorted(name for name in sources if name.startswith("BTCUSDT"))
+        interrupted, legacy, corrupted = (os.path.join(download_path, name) for name in names[-3:])
+        size = os.path.getsize(interrupted)
+        with open(interrupted, "rb") as f:
+            head = f.read(size // 2)
+        os.remove(interrupted)
+        with open(f"{interrupted}.part", "wb") as f:
+            f.write(head)
+        with open(legacy, "r+b") as f:
+            f.truncate(os.path.getsize(legacy) // 2)
+        os.remove(corrupted)
+        with open(f"{sources[os.path.basename(corrupted)]}.CHECKSUM", "w") as f:
+            f.write(f"{'0' * 64}  {os.path.basename(corrupted)}\n")
+
+        report = run("BTCUSDT", args.days + 1, download_path, data_url)
+        statuses = {os.path.basename(r.path): r for r in report.results}
+        resumed = statuses[os.path.basename(interrupted)]
+        assert resumed.status == "resumed" and resumed.bytes == size - len(head), resumed
+        assert sha256(interrupted) == sha256(sources[os.path.basename(interrupted)])
+        assert statuses[os.path.basename(legacy)].status == "downloaded"
+        assert sha256(legacy) == sha256(sources[os.path.basename(legacy)])
+        assert statuses[os.path.basename(corrupted)].status == "failed"
+        assert not os.path.exists(corrupted) and not os.path.exists(f"{corrupted}.part")
+        print(f"Rerun: {report.summary()}")
+        print("Resume fetched only the missing half, truncated legacy zip replaced, checksum mismatch rejected")
+        exchange.stop()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
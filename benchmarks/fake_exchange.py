@@ -0,0 +1,184 @@
+"""A local stand-in for the Binance REST klines endpoint and kline websocket.
+
+Serves random-walk 1m klines for any symbol. Every `tick` seconds the open
+candle of each symbol closes and a new one opens, and the change is pushed to
+websocket subscribers as Binance `kline` events. `drop_after` closes each
+websocket after that many messages to exercise reconnects. With `data_dir`
+the files under it are served at `/data`, standing in for data.binance.vision.
+Run standalone and
+point the node at it with
+
+    python -m benchmarks.fake_exchange --port 9100
+    BINANCE_API_URL=http://127.0.0.1:9100 BINANCE_WS_URL=ws://127.0.0.1:9100 LIVE_DATA_SOURCE=stream python app.py
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import numpy as np
+from aiohttp import web
+
+INTERVAL_MS = 60_000
+PRICES = {"BTCUSDT": 30000.0, "ETHUSDT": 2000.0}
+
+
+class FakeExchange:
+    def __init__(self, history=1000, tick=1.0, drop_after=None, start_ms=1_700_000_000_000, seed=0, data_dir=None):
+        self.history = history
+        self.data_dir = data_dir
+        self.tick = tick
+        self.drop_after = drop_after
+        self.start_ms = start_ms
+        self.rng = np.random.default_rng(seed)
+        self.klines = {}
+        self.subscribers = set()
+        self.rest_requests = 0
+        self.ws_connections = 0
+        self.paused = False
+        self.port = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def _new_kline(self, start_time, open_price):
+        close = open_price * float(np.exp(self.rng.normal(0, 0.001)))
+        volume = float(self.rng.gamma(2.0, 5.0))
+        return [
+            start_time, f"{open_price:.8f}", f"{max(open_price, close):.8f}", f"{min(open_price, close):.8f}",
+            f"{close:.8f}", f"{volume:.8f}", start_time + INTERVAL_MS - 1, f"{volume * close:.8f}",
+            int(self.rng.integers(50, 500)), f"{volume / 2:.8f}", f"{volume * close / 2:.8f}", "0",
+        ]
+
+    def series(self, symbol):
+        if symbol not in self.klines:
+            price = PRICES.get(symbol, 100.0)
+            rows = []
+            for i in range(self.history):
+                rows.append(self._new_kline(self.start_ms + i * INTERVAL_MS, price))
+                price = float(rows[-1][4])
+            self.klines[symbol] = rows
+        return self.klines[symbol]
+
+    def advance(self):
+        """Close the open candle of every symbol and open the next one; returns the changed rows."""
+        events = []
+        for symbol, rows in self.klines.items():
+            closed = rows[-1]
+            rows.append(self._new_kline(closed[0] + INTERVAL_MS, float(closed[4])))
+            del rows[:-self.history * 2]
+            events.append((symbol, closed, True))
+            events.append((symbol, rows[-1], False))
+        return events
+
+    @staticmethod
+    def event(symbol, row, closed):
+        kline = dict(zip(["t", "o", "h", "l", "c", "v", "T", "q", "n", "V", "Q"], row[:11]))
+        kline.update({"s": symbol, "i": "1m", "x": closed})
+        return {"stream": f"{symbol.lower()}@kline_1m", "data": {"e": "kline", "E": row[6], "s": symbol, "k": kline}}
+
+    async def klines_handler(self, request):
+        self.rest_requests += 1
+        limit = int(request.query.get("limit", 500))
+        return web.json_response(self.series(request.query["symbol"])[-limit:])
+
+    async def stream_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.ws_connections += 1
+        symbols = {name.split("@")[0].upper() for name in request.query.get("streams", "").split("/") if name}
+        for symbol in symbols:
+            self.series(symbol)
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        sent = 0
+        try:
+            while not ws.closed:
+                event = await queue.get()
+                if event is None:
+                    break
+                symbol, row, closed = event
+                if symbol not in symbols:
+                    continue
+                await ws.send_json(self.event(symbol, row, closed))
+                sent += 1
+                if self.drop_after and sent >= self.drop_after:
+                    break
+        finally:
+            self.subscribers.discard(queue)
+            await ws.close()
+        return ws
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            if self.paused:
+                continue
+            for event in self.advance():
+                for queue in list(self.subscribers):
+                    queue.put_nowait(event)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/api/v3/klines", self.klines_handler)
+        app.router.add_get("/stream", self.stream_handler)
+        if self.data_dir:
+            # Daily zips laid out like data.binance.vision; aiohttp answers Range requests for static files
+            app.router.add_static("/data", self.data_dir)
+        return app
+
+    async def _start(self, host, port):
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._ticker_task = asyncio.ensure_future(self._ticker())
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serve in a background thread; returns the base URL."""
+        if not port:
+            with socket.socket() as s:
+                s.bind((host, 0))
+                port = s.getsockname()[1]
+        self.port = port
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start(host, port))
+            self._ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-exchange", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        async def shutdown():
+            self._ticker_task.cancel()
+            for queue in list(self.subscribers):
+                queue.put_nowait(None)
+            await self._runner.cleanup()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--tick", type=float, default=60.0, help="Seconds per candle")
+    parser.add_argument("--drop-after", type=int, default=None, help="Close each websocket after this many messages")
+    parser.add_argument("--data-dir", default=None, help="Directory served at /data, e.g. data/spot/daily/klines/<pair>/1m/*.zip")
+    args = parser.parse_args()
+
+    exchange = FakeExchange(tick=args.tick, drop_after=args.drop_after, data_dir=args.data_dir)
+    for symbol in PRICES:
+        exchange.series(symbol)
+    print(f"Fake exchange on {exchange.start(args.host, args.port)}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
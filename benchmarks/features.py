@@ -0,0 +1,140 @@
+"""Parity and timing checks for the feature pipeline.
+
+Compares the incremental live engine and the vectorized batch builder against
+the pandas implementations they replaced. Run from the repository root:
+
+    python -m benchmarks.features
+"""
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+from features import FEATURES, FeatureEngine, build_features
+from model import build_live_features
+from benchmarks.synthetic import synthetic_klines, synthetic_price_frame
+
+
+def legacy_build_features(price_df):
+    """The column-by-column feature engineering `format_data` used before `build_features`."""
+    for pair in ["ETHUSDT", "BTCUSDT"]:
+        price_df[f"log_return_{pair}"] = np.log(price_df[f"close_{pair}"].shift(-1) / price_df[f"close_{pair}"])
+        price_df[f"volatility_6h_{pair}"] = price_df[f"log_return_{pair}"].rolling(window=360).std() * np.sqrt(360)
+        for metric in ["close", "volume", "log_return"]:
+            for lag in range(1, 11):
+                price_df[f"{metric}_{pair}_lag{lag}"] = price_df[f"{metric}_{pair}"].shift(lag)
+        price_df[f"volatility_6h_{pair}_lag1"] = price_df[f"volatility_6h_{pair}"].shift(1)
+    price_df["hour_of_day"] = price_df.index.hour
+    return price_df
+
+
+def live_frames(n_rows, seed):
+    btc = synthetic_klines(n_rows, price=30000.0, seed=seed)
+    eth = synthetic_klines(n_rows, price=2000.0, seed=seed + 1)
+    return btc, eth
+
+
+def pandas_latest(btc, eth):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return build_live_features({"BTCUSDT": btc, "ETHUSDT": eth}).iloc[[-1]]
+
+
+def relative_error(actual, expected):
+    return (np.abs(actual - expected) / np.maximum(np.abs(expected), np.finfo(float).tiny)).ravel()
+
+
+def check_parity(steps, window, seed, rtol=1e-9):
+    """Slide a 1000-row live window forward like consecutive fetches would and compare
+    the incremental engine to the pandas path at every step."""
+    btc, eth = live_frames(window + steps, seed)
+    engine = FeatureEngine()
+    worst = 0.0
+    for step in range(steps):
+        end = window + step
+        live_btc, live_eth = btc.iloc[end - window:end], eth.iloc[end - window:end]
+        expected = pandas_latest(live_btc, live_eth)
+        actual = engine.ingest({"BTCUSDT": live_btc, "ETHUSDT": live_eth})
+        if actual.index[0] != expected.index[0]:
+            raise AssertionError(f"Step {step}: engine row {actual.index[0]} != pandas row {expected.index[0]}")
+        diff = relative_error(actual.to_numpy(), expected.to_numpy())
+        if diff.max() > rtol:
+            column = FEATURES[int(np.argmax(diff))]
+            raise AssertionError(f"Step {step}: engine differs from pandas path in {column}")
+        worst = max(worst, float(diff.max()))
+    print(f"Parity OK over {steps} steps, max relative error {worst:.2e}")
+
+
+def time_per_request(repeat, window, seed):
+    btc, eth = live_frames(window + repeat, seed)
+    engine = FeatureEngine()
+    engine.ingest({"BTCUSDT": btc.iloc[:window], "ETHUSDT": eth.iloc[:window]})
+
+    pandas_seconds = []
+    engine_seconds = []
+    for step in range(1, repeat + 1):
+        live_btc, live_eth = btc.iloc[step:window + step], eth.iloc[step:window + step]
+        start = time.perf_counter()
+        pandas_latest(live_btc, live_eth)
+        pandas_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        engine.ingest({"BTCUSDT": live_btc, "ETHUSDT": live_eth})
+        engine_seconds.append(time.perf_counter() - start)
+
+    print(f"pandas path:        median {np.median(pandas_seconds) * 1e3:.3f} ms per request")
+    print(f"incremental engine: median {np.median(engine_seconds) * 1e3:.3f} ms per request")
+
+
+def build_and_extract(builder, price_df):
+    """Build the features and pull out the matrix training and serving actually consume."""
+    df = builder(price_df)
+    return df, df[FEATURES].to_numpy()
+
+
+def measure(builder, price_df, repeat):
+    """Best-of-`repeat` wall time and traced peak memory of `build_and_extract`."""
+    seconds = []
+    for _ in range(repeat):
+        frame = price_df.copy()
+        start = time.perf_counter()
+        build_and_extract(builder, frame)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result, _ = build_and_extract(builder, price_df.copy())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(seconds), peak
+
+
+def compare_batch(days, repeat, seed):
+    """Time and check the offline feature build on `days` of 1m data."""
+    price_df = synthetic_price_frame(days * 1440, seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        expected, legacy_seconds, legacy_peak = measure(legacy_build_features, price_df, repeat)
+    actual, new_seconds, new_peak = measure(build_features, price_df, repeat)
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_like=True, rtol=1e-12)
+    print(f"Batch features match legacy output on {len(price_df)} rows ({days} days)")
+    print(f"legacy column inserts: {legacy_seconds:.3f} s, peak {legacy_peak / 2**20:.1f} MiB")
+    print(f"build_features:        {new_seconds:.3f} s, peak {new_peak / 2**20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=200, help="Consecutive fetches to compare")
+    parser.add_argument("--window", type=int, default=1000, help="Rows per live fetch")
+    parser.add_argument("--days", type=int, default=365, help="Days of 1m data for the batch comparison")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per batch builder; the best is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    check_parity(args.steps, args.window, args.seed)
+    time_per_request(args.steps, args.window, args.seed)
+    compare_batch(args.days, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
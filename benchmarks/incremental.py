@@ -0,0 +1,95 @@
+"""Memory, time and accuracy of TRAINING_MODE=incremental against the full refit.
+
+Writes `--days` days of synthetic features and targets to memory-mapped files
+like the npy training store, then for LinearRegression and BayesianRidge
+compares the full path of `train_model` (scale every row in memory, fit) with
+fitting from `incremental.Moments` built `--chunk-rows` rows at a time: fit
+time, peak traced memory and the largest prediction difference on the last
+day. Finally it times the nightly update, one day folded in and the oldest
+day taken out, against recomputing the moments of the whole window. Run from
+the repository root:
+
+    python -m benchmarks.incremental --days 30 --chunk-rows 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import BayesianRidge, LinearRegression
+from sklearn.preprocessing import StandardScaler
+from features import FEATURES, add_targets, build_features
+from incremental import Moments, fit_incremental, fit_scaler
+from topics import TARGETS
+from benchmarks.synthetic import synthetic_price_frame
+
+
+def measured(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def write_store(days, seed, directory):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = add_targets(build_features(synthetic_price_frame(days * 1440, seed))).dropna()
+    for name, values in [("X", df[FEATURES].to_numpy(dtype=np.float64)), ("y", df[TARGETS].to_numpy(dtype=np.float64))]:
+        np.save(os.path.join(directory, f"{name}.npy"), values)
+    return (np.load(os.path.join(directory, "X.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "y.npy"), mmap_mode="r"))
+
+
+def fit_full(model, X, y):
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    return scaler, model.fit(X_scaled, y[:, 0])
+
+
+def fit_chunked(model_name, X, y, chunk_rows):
+    moments = Moments(FEATURES + TARGETS).fold(X, y, 0, len(X), chunk_rows)
+    return fit_scaler(moments, len(FEATURES)), fit_incremental(model_name, moments, len(FEATURES), len(FEATURES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30, help="Days of 1m rows in the window")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="TRAINING_CHUNK_ROWS")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="incremental-bench-")
+    try:
+        X, y = write_store(args.days, args.seed, directory)
+        print(f"{len(X)} rows, {X.shape[1]} features, {X.nbytes / 2**20:.0f} MiB on disk, chunks of {args.chunk_rows} rows\n")
+        last_day = np.asarray(X[-1440:])
+        for name, model in [("LinearRegression", LinearRegression()), ("BayesianRidge", BayesianRidge())]:
+            (scaler, full), full_seconds, full_peak = measured(lambda: fit_full(model, X, y))
+            (chunked_scaler, chunked), seconds, peak = measured(lambda: fit_chunked(name, X, y, args.chunk_rows))
+            difference = np.abs(full.predict(scaler.transform(last_day)) - chunked.predict(chunked_scaler.transform(pd.DataFrame(last_day, columns=FEATURES)))).max()
+            print(f"{name:<17} full    fit {full_seconds:7.2f}s  peak {full_peak:8.1f} MiB")
+            print(f"{name:<17} chunked fit {seconds:7.2f}s  peak {peak:8.1f} MiB  max|Δpred| {difference:.2e}  (target std {y[:, 0].std():.2e})")
+
+        previous = Moments(FEATURES + TARGETS).fold(X, y, 0, len(X) - 1440, args.chunk_rows)
+        _, rebuild_seconds, rebuild_peak = measured(lambda: Moments(FEATURES + TARGETS).fold(X, y, 1440, len(X), args.chunk_rows))
+        moved, update_seconds, update_peak = measured(
+            lambda: previous.fold(X, y, len(X) - 1440, len(X), args.chunk_rows).fold(X, y, 0, 1440, args.chunk_rows, sign=-1))
+        rebuilt = Moments(FEATURES + TARGETS).fold(X, y, 1440, len(X), args.chunk_rows)
+        drift = np.abs(moved.comoment - rebuilt.comoment).max() / np.abs(rebuilt.comoment).max()
+        print(f"\nNightly update: fold in 1 day, drop 1 day {update_seconds:7.3f}s  peak {update_peak:6.1f} MiB")
+        print(f"Recompute the {args.days - 1} day window       {rebuild_seconds:7.3f}s  peak {rebuild_peak:6.1f} MiB  "
+              f"relative difference {drift:.1e}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Accuracy, memory and speed of the approximate kernel models against exact fits.
+
+Fits exact `SVR` and `KernelRidge` on synthetic features of `--days` days,
+then `ApproximateSVR` / `ApproximateKernelRidge` with Nystroem and random
+Fourier features at each `--ranks`, and reports fit time, peak traced memory,
+single-row predict latency, test RMSE and R², and the RMSE delta and largest
+prediction difference against the exact fit. `--scale-days` then fits only the
+approximation on more days, next to the n x n kernel matrix an exact
+KernelRidge would need. Run from the repository root:
+
+    python -m benchmarks.kernel_approx --days 2 --ranks 100,300,1000 --scale-days 7,30
+"""
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+import numpy as np
+from sklearn.kernel_ridge import KernelRidge
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.svm import SVR
+from kernel_approx import ApproximateKernelRidge, ApproximateSVR
+from benchmarks.knn_index import training_matrix
+
+
+def fit_measured(model, X, y):
+    tracemalloc.start()
+    start = time.perf_counter()
+    model.fit(X, y)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def per_row_us(model, queries):
+    start = time.perf_counter()
+    for row in queries:
+        model.predict(row[None, :])
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def evaluate(name, model, X_train, y_train, X_test, y_test, exact=None):
+    seconds, peak = fit_measured(model, X_train, y_train)
+    predictions = model.predict(X_test)
+    rmse = float(np.sqrt(mean_squared_error(y_test, predictions)))
+    line = (f"{name:<34} fit {seconds:8.2f}s  peak {peak:8.1f} MiB  predict {per_row_us(model, X_test[:100]):8.1f} us/row  "
+            f"RMSE {rmse:.6f}  R² {r2_score(y_test, predictions):7.4f}")
+    if exact is not None:
+        line += f"  ΔRMSE {rmse - exact[0]:+.2e}  max|Δpred| {np.abs(predictions - exact[1]).max():.2e}"
+    print(line)
+    return rmse, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=2, help="Days of 1m rows for the exact comparison")
+    parser.add_argument("--ranks", default="100,300,1000", help="Comma-separated approximation ranks")
+    parser.add_argument("--scale-days", default="", help="Comma-separated larger day counts fitted only approximately")
+    parser.add_argument("--C", type=float, default=1.0)
+    parser.add_argument("--epsilon", type=float, default=0.001)
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    ranks = [int(rank) for rank in args.ranks.split(",")]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y = training_matrix(args.days, args.seed)
+    split = int(len(X) * 0.8)
+    X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
+    print(f"{len(X_train)} training rows, {X.shape[1]} features\n")
+
+    cases = [
+        ("SVR rbf", SVR(C=args.C, epsilon=args.epsilon, kernel="rbf"),
+         lambda method, rank: ApproximateSVR(C=args.C, epsilon=args.epsilon, kernel="rbf", method=method, n_components=rank)),
+        ("KernelRidge rbf", KernelRidge(alpha=args.alpha, kernel="rbf"),
+         lambda method, rank: ApproximateKernelRidge(alpha=args.alpha, kernel="rbf", method=method, n_components=rank)),
+        ("KernelRidge linear (default)", KernelRidge(alpha=args.alpha),
+         lambda method, rank: ApproximateKernelRidge(alpha=args.alpha, method=method, n_components=rank)),
+    ]
+    for name, exact_model, approximate in cases:
+        exact = evaluate(f"{name}, exact", exact_model, X_train, y_train, X_test, y_test)
+        if name.endswith("(default)"):
+            # The linear kernel is solved in primal form, no approximation involved
+            evaluate(f"{name}, primal", approximate("nystroem", 0), X_train, y_train, X_test, y_test, exact)
+        else:
+            for method in ["nystroem", "rff"]:
+                for rank in ranks:
+                    evaluate(f"{name}, {method} {rank}", approximate(method, rank), X_train, y_train, X_test, y_test, exact)
+        print()
+
+    for days in [int(days) for days in args.scale_days.split(",") if days]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            X, y = training_matrix(days, args.seed)
+        split = int(len(X) * 0.8)
+        print(f"{days} days, {split} training rows; exact KernelRidge kernel matrix alone: {split ** 2 * 8 / 2**20:,.0f} MiB")
+        for name, model in [
+            (f"KernelRidge rbf, nystroem {ranks[-1]}", ApproximateKernelRidge(alpha=args.alpha, kernel="rbf", n_components=ranks[-1])),
+            (f"SVR rbf, nystroem {ranks[-1]}", ApproximateSVR(C=args.C, epsilon=args.epsilon, n_components=ranks[-1])),
+        ]:
+            evaluate(name, model, X[:split], y[:split], X[split:], y[split:])
+        print()
+
+
+if __name__ == "__main__":
+    main()
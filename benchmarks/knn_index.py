@@ -0,0 +1,73 @@
+"""Latency and recall of the KNN serving index against the exact sklearn model.
+
+Fits `KNeighborsRegressor` on synthetic features, builds a `KNNIndex` of every
+kind and compares single-row query latency (the shape `/inference` serves),
+neighbour recall and predictions. Run from the repository root:
+
+    python -m benchmarks.knn_index --days 90 --k 200 --metric manhattan
+"""
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import StandardScaler
+from features import FEATURES, add_targets, build_features
+from knn_index import INDEX_KINDS, LEAF_SIZES, KNNIndex
+from topics import TARGETS
+from benchmarks.synthetic import synthetic_price_frame
+
+
+def training_matrix(days, seed):
+    df = add_targets(build_features(synthetic_price_frame(days * 1440, seed))).dropna()
+    X = StandardScaler().fit_transform(df[FEATURES].to_numpy())
+    return X, df[TARGETS[0]].to_numpy()
+
+
+def per_query_ms(predict, queries):
+    start = time.perf_counter()
+    for row in queries:
+        predict(row.reshape(1, -1))
+    return (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def recall(expected, actual):
+    """Fraction of the exact neighbours the index returned, averaged over queries."""
+    return float(np.mean([len(np.intersect1d(e, a)) / len(e) for e, a in zip(expected, actual)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90, help="Days of 1m training rows")
+    parser.add_argument("--k", type=int, default=50, help="n_neighbors")
+    parser.add_argument("--metric", default="minkowski", choices=["minkowski", "manhattan"])
+    parser.add_argument("--weights", default="distance", choices=["uniform", "distance"])
+    parser.add_argument("--queries", type=int, default=200, help="Single-row queries timed per engine")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    X, y = training_matrix(args.days, args.seed)
+    split = int(len(X) * 0.8)
+    X_train, y_train, queries = X[:split], y[:split], X[split:][:args.queries]
+    print(f"{len(X_train)} training rows, {X.shape[1]} features, k={args.k}, {args.metric}, {args.weights}")
+
+    model = KNeighborsRegressor(n_neighbors=args.k, metric=args.metric, weights=args.weights).fit(X_train, y_train)
+    exact_ms = per_query_ms(model.predict, queries)
+    _, exact_neighbours = model.kneighbors(queries)
+    expected = model.predict(queries)
+    print(f"{'sklearn KNeighborsRegressor':<28} {exact_ms:8.3f} ms per query")
+
+    for kind in list(INDEX_KINDS) + ["brute"]:
+        for leaf_size in (LEAF_SIZES if kind != "brute" else [None]):
+            with contextlib.redirect_stdout(io.StringIO()):
+                index = KNNIndex.from_regressor(model, X_train, y_train, queries[:1], leaf_sizes=[leaf_size], kinds=(kind,))
+            ms = per_query_ms(index.predict, queries)
+            _, neighbours = index.kneighbors(queries)
+            diff = np.abs(index.predict(queries) - expected).max()
+            label = f"{kind} leaf_size {leaf_size}" if leaf_size else kind
+            print(f"{label:<28} {ms:8.3f} ms per query, {exact_ms / ms:5.1f}x, recall {recall(exact_neighbours, neighbours):.4f}, max prediction diff {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
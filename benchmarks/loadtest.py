@@ -0,0 +1,171 @@
+"""Throughput of /inference under concurrent load for each way of serving the app.
+
+Trains a model on synthetic data from `benchmarks.fake_exchange`, then starts
+the node in each serving setup against the same data directory and drives
+`/inference/<token>` with `--concurrency` clients for `--seconds`:
+
+    dev        Flask's development server (`python app.py`, what docker-compose used)
+    gthread    gunicorn, 1 worker x 8 threads, no preload (the previous gunicorn_conf.py)
+    gunicorn   gunicorn_conf.py: preloaded app, one worker per core
+
+    python -m benchmarks.loadtest --concurrency 32 --seconds 20
+    GUNICORN_WORKERS=4 python -m benchmarks.loadtest --setups gthread,gunicorn
+
+Reports requests per second, latency percentiles and errors, optionally as
+JSON. The gunicorn setups are skipped when gunicorn is not installed.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+import numpy as np
+from benchmarks.download import publish
+from benchmarks.fake_exchange import FakeExchange, PRICES
+from benchmarks.pipeline import REPO_ROOT, node_env
+
+SETUPS = ["dev", "gthread", "gunicorn"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_command(setup, port):
+    if setup == "dev":
+        # app.py's __main__ without the update_data() that precedes it
+        return [sys.executable, "-c", f"from app import app; app.run(host='127.0.0.1', port={port})"]
+    if setup == "gthread":
+        return [sys.executable, "-m", "gunicorn", "--worker-class", "gthread", "--workers", "1", "--threads", "8",
+                "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"]
+    return [sys.executable, "-m", "gunicorn", "--conf", os.path.join(REPO_ROOT, "gunicorn_conf.py"),
+            "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "--access-logfile", "/dev/null"]
+
+
+async def wait_ready(url, timeout):
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            with contextlib.suppress(aiohttp.ClientError):
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+async def drive(url, concurrency, seconds):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def client(session):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    ok = response.status == 200
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1e3 if latencies else np.array([np.nan])
+    return {
+        "requests": int(np.isfinite(latencies).sum()),
+        "errors": errors,
+        "rps": round(float(np.isfinite(latencies).sum() / elapsed), 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def run_setup(setup, env, base_path, args):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with open(os.path.join(base_path, f"{setup}.log"), "w") as log:
+        server = subprocess.Popen(server_command(setup, port), env=env, cwd=base_path, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            asyncio.run(wait_ready(f"{base_url}/inference/{args.token}", args.startup_timeout))
+            return asyncio.run(drive(f"{base_url}/inference/{args.token}", args.concurrency, args.seconds))
+        finally:
+            server.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                server.wait(30)
+            if server.poll() is None:
+                server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--setups", default=",".join(SETUPS), help=f"Comma-separated subset of {','.join(SETUPS)}")
+    parser.add_argument("--model", default="KNN")
+    parser.add_argument("--days", type=int, default=3, help="Days of 1m training data")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--serving-mode", default="sync", choices=["sync", "precompute"])
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+    args.token = "BTC"
+
+    setups = [setup.strip() for setup in args.setups.split(",")]
+    if importlib.util.find_spec("gunicorn") is None:
+        print("gunicorn is not installed, only the dev server is measured")
+        setups = [setup for setup in setups if setup == "dev"]
+
+    root = tempfile.mkdtemp(prefix="loadtest-")
+    results = {}
+    try:
+        served = os.path.join(root, "served", "data")
+        publish(args.days, served, {pair: PRICES[pair] for pair in ["BTCUSDT", "ETHUSDT"]})
+        exchange = FakeExchange(data_dir=served)
+        data_url = exchange.start()
+        base_path = os.path.join(root, "node")
+        os.makedirs(base_path)
+        env = node_env(base_path, args.model, [args.token, "ETH"], args.days, data_url, SERVING_MODE=args.serving_mode)
+        env.pop("GUNICORN_PRELOAD", None)
+        print(f"Training {args.model} on {args.days} days of synthetic data...")
+        subprocess.run([sys.executable, "-c", "from model import update_data; update_data()"],
+                       env=env, cwd=base_path, check=True, stdout=subprocess.DEVNULL)
+
+        for setup in setups:
+            results[setup] = run_setup(setup, env, base_path, args)
+            print(f"{setup:<10} {results[setup]['rps']:>8.1f} req/s  p50 {results[setup]['p50_ms']:>8.2f} ms  "
+                  f"p95 {results[setup]['p95_ms']:>8.2f} ms  p99 {results[setup]['p99_ms']:>8.2f} ms  "
+                  f"errors {results[setup]['errors']}")
+        exchange.stop()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if "dev" in results and len(results) > 1:
+        for setup, result in results.items():
+            if setup != "dev" and results["dev"]["rps"]:
+                print(f"{setup} throughput vs dev server: {result['rps'] / results['dev']['rps']:.2f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": {k: v for k, v in vars(args).items() if k != "output"}, "cpus": os.cpu_count(), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Times the whole ingest -> train -> infer pipeline against a local fake exchange.
+
+Writes synthetic Binance daily zips for `--days` days of every pair, serves
+them and the live klines endpoint with `benchmarks.fake_exchange`, then runs
+each model of `train_model` in its own process on a fresh data directory:
+
+    download   download_data for every pair
+    format     format_data
+    load       load_frame
+    train      train_model
+    fetch      fetch_live_data
+    preprocess preprocess_live_data
+    inference  get_inference, `--requests` times, with the live cache disabled
+
+Every stage records wall time and the process peak RSS after it. The results
+are written as JSON, and `--compare` prints the ratio of every stage time to
+an earlier results file, so a regression shows up between versions:
+
+    python -m benchmarks.pipeline --days 7 --output before.json
+    python -m benchmarks.pipeline --days 7 --output after.json --compare before.json
+
+`--tokens` scales the number of pairs; every token is served as a 6h topic
+of the model being benchmarked. Needs no network access.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+MODELS = ["LinearRegression", "BayesianRidge", "KNN", "SVR", "KernelRidge"]
+STAGES = ["download", "format", "load", "train", "fetch", "preprocess", "inference"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Stages:
+    """Collects the time and peak RSS of each stage run in the worker process."""
+
+    def __init__(self):
+        self.results = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+        self.results[name] = {"seconds": round(time.perf_counter() - start, 6), "peak_rss_mib": round(peak_rss_mib(), 1)}
+
+
+def worker(args):
+    """Run every stage for the model configured in the environment; imported after the env is set."""
+    from model import download_data, fetch_live_data, format_data, get_inference, load_frame, preprocess_live_data, train_model
+    from topics import PAIRS, TOPICS
+    from config import TIMEFRAME, TRAINING_DAYS, REGION, DATA_PROVIDER
+
+    stages = Stages()
+    stages.results["import"] = {"seconds": None, "peak_rss_mib": round(peak_rss_mib(), 1)}
+    with stages.stage("download"):
+        files = {pair: download_data(pair.removesuffix("USDT"), TRAINING_DAYS, REGION, DATA_PROVIDER) for pair in PAIRS}
+    with stages.stage("format"):
+        format_data(files, DATA_PROVIDER)
+    with stages.stage("load"):
+        X_train, _, _, _, scaler = load_frame(TIMEFRAME)
+    rows = len(X_train)
+    del X_train
+    with stages.stage("train"):
+        train_model(TIMEFRAME)
+    with stages.stage("fetch"):
+        frames = fetch_live_data(REGION, DATA_PROVIDER)
+    with stages.stage("preprocess"):
+        preprocess_live_data(frames, scaler)
+    latencies = []
+    with stages.stage("inference"):
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            get_inference(TOPICS[0].token, TIMEFRAME, REGION, DATA_PROVIDER)
+            latencies.append(time.perf_counter() - start)
+    stages.results["inference"].update({
+        "requests": args.requests,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1e3, 3),
+    })
+    return {"training_rows": rows, "pairs": PAIRS, "stages": stages.results}
+
+
+def node_env(base_path, model, tokens, days, data_url, **overrides):
+    """Environment that points a node process at `base_path` and the fake exchange at `data_url`."""
+    return dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        APP_BASE_PATH=base_path,
+        TOKEN=tokens[0],
+        MODEL=model,
+        TOPICS=",".join(f"{token}:6h:{model}" for token in tokens),
+        # The newest day is not published, like today's zip on data.binance.vision
+        TRAINING_DAYS=str(days + 1),
+        TIMEFRAME="1m",
+        REGION="com",
+        DATA_PROVIDER="binance",
+        BINANCE_DATA_URL=data_url,
+        BINANCE_API_URL=data_url,
+        **overrides,
+    )
+
+
+def run_model(model, tokens, args, data_url, root):
+    """Run the worker for `model` in a fresh process and data directory; returns its results."""
+    base_path = os.path.join(root, model)
+    os.makedirs(base_path)
+    output = os.path.join(base_path, "result.json")
+    env = node_env(
+        base_path, model, tokens, args.days, data_url,
+        LIVE_DATA_SOURCE="rest",
+        LIVE_DATA_TTL="0",
+        SERVING_MODE="sync",
+        SEARCH_BUDGET_SECONDS=str(args.search_budget),
+    )
+    command = [sys.executable, "-m", "benchmarks.pipeline", "--worker", output, "--requests", str(args.requests)]
+    # The worker runs in its data directory so no .env of the repository is picked up
+    completed = subprocess.run(command, env=env, cwd=base_path, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"model": model, "error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+    with open(output) as f:
+        return {"model": model, **json.load(f)}
+
+
+def print_results(results, baseline=None):
+    baseline = {result["model"]: result for result in (baseline or {}).get("results", [])}
+    print(f"{'model':<17}" + "".join(f"{stage:>12}" for stage in STAGES) + f"{'p95 ms':>10}{'peak MiB':>10}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['model']:<17} failed: {result['error']}")
+            continue
+        stages = result["stages"]
+        print(f"{result['model']:<17}" + "".join(f"{stages[stage]['seconds']:>11.3f}s" for stage in STAGES)
+              + f"{stages['inference']['p95_ms']:>10.2f}{max(s['peak_rss_mib'] for s in stages.values()):>10.1f}")
+        before = baseline.get(result["model"])
+        if before and "stages" in before:
+            ratios = [stages[stage]["seconds"] / before["stages"][stage]["seconds"] if before["stages"][stage]["seconds"] else float("nan") for stage in STAGES]
+            print(f"{'  vs baseline':<17}" + "".join(f"{ratio:>11.2f}x" for ratio in ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=3, help="Days of 1m history per pair")
+    parser.add_argument("--tokens", default="BTC,ETH", help="Comma-separated tokens; BTC and ETH are always included")
+    parser.add_argument("--models", default=",".join(MODELS), help=f"Comma-separated subset of {','.join(MODELS)}")
+    parser.add_argument("--requests", type=int, default=20, help="get_inference calls timed per model")
+    parser.add_argument("--search-budget", type=float, default=0, help="SEARCH_BUDGET_SECONDS for KNN and SVR")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path")
+    parser.add_argument("--compare", default=None, help="Earlier --output file to compare stage times against")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = worker(args)
+        with open(args.worker, "w") as f:
+            json.dump(result, f)
+        return
+
+    from benchmarks.download import publish
+    from benchmarks.fake_exchange import FakeExchange, PRICES
+
+    tokens = list(dict.fromkeys(token.strip().upper() for token in args.tokens.split(",") if token.strip()))
+    pairs = list(dict.fromkeys([f"{token}USDT" for token in tokens] + ["ETHUSDT", "BTCUSDT"]))
+    root = tempfile.mkdtemp(prefix="pipeline-bench-")
+    try:
+        served = os.path.join(root, "served", "data")
+        publish(args.days, served, {pair: PRICES.get(pair, 100.0) for pair in pairs})
+        exchange = FakeExchange(data_dir=served)
+        data_url = exchange.start()
+        results = []
+        for model in args.models.split(","):
+            results.append(run_model(model.strip(), tokens, args, data_url, root))
+            print(f"{model}: done", file=sys.stderr)
+        exchange.stop()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {"days": args.days, "pairs": pairs, "requests": args.requests, "search_budget": args.search_budget},
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
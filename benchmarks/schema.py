@@ -0,0 +1,93 @@
+"""Parse time and memory of the typed OHLCV frames against the code they replaced.
+
+Compares the 1000-row live kline frame built from exchange JSON, and reading a
+multi-year training CSV in float64 and float32. Run from the repository root:
+
+    python -m benchmarks.schema --days 730
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from features import FEATURES, add_targets, build_features
+from schema import FEATURE_DTYPES, klines_frame
+from store import read_training_csv
+from benchmarks.fake_exchange import FakeExchange
+
+
+def legacy_klines_frame(klines):
+    """The conversion `download_binance_current_day_data` used before schema.py."""
+    columns = ['start_time','open','high','low','close','volume','end_time','volume_usd','n_trades','taker_volume','taker_volume_usd','ignore']
+    df = pd.DataFrame(klines,columns=columns)
+    df['date'] = [pd.to_datetime(x+1,unit='ms') for x in df['end_time']]
+    df['date'] = df['date'].apply(pd.to_datetime)
+    df[["volume", "taker_volume", "open", "high", "low", "close"]] = df[["volume", "taker_volume", "open", "high", "low", "close"]].apply(pd.to_numeric)
+    return df.sort_index()
+
+
+def legacy_read_csv(path):
+    df = pd.read_csv(path, index_col='date', parse_dates=True)
+    df.ffill(inplace=True)
+    df.bfill(inplace=True)
+    return df
+
+
+def measure(function, *args, repeat=3):
+    """Best-of-`repeat` wall time, traced peak memory and the result of function(*args)."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(seconds), peak
+
+
+def report(label, seconds, peak, frame):
+    print(f"{label:<34} {seconds * 1e3:9.2f} ms, peak {peak / 2**20:8.2f} MiB, frame {frame.memory_usage(deep=True).sum() / 2**20:8.2f} MiB")
+
+
+def compare_live(repeat):
+    payload = json.dumps(FakeExchange().series("BTCUSDT"))
+    legacy, seconds, peak = measure(lambda: legacy_klines_frame(json.loads(payload)), repeat=repeat)
+    report("live frame, legacy conversion", seconds, peak, legacy)
+    typed, seconds, peak = measure(lambda: klines_frame(json.loads(payload)), repeat=repeat)
+    report("live frame, typed schema", seconds, peak, typed)
+    for column in ["open", "high", "low", "close", "volume", "taker_volume", "date"]:
+        np.testing.assert_array_equal(typed[column].to_numpy(), legacy[column].to_numpy())
+    print(f"typed columns: {', '.join(f'{c}={t}' for c, t in typed.dtypes.items())}")
+
+
+def compare_training(days, repeat):
+    from benchmarks.synthetic import synthetic_price_frame
+    price_df = add_targets(build_features(synthetic_price_frame(days * 1440))).dropna()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "price_data.csv")
+        price_df.to_csv(path, date_format='%Y-%m-%d %H:%M:%S')
+        print(f"training CSV: {len(price_df)} rows ({days} days), {os.path.getsize(path) / 2**20:.0f} MiB on disk")
+        legacy, seconds, peak = measure(legacy_read_csv, path, repeat=repeat)
+        report("training CSV, legacy read_csv", seconds, peak, legacy)
+        for name, dtype in FEATURE_DTYPES.items():
+            typed, seconds, peak = measure(read_training_csv, path, dtype, repeat=repeat)
+            report(f"training CSV, typed {name}", seconds, peak, typed)
+            np.testing.assert_allclose(typed[FEATURES].to_numpy(np.float64), legacy[FEATURES].to_numpy(np.float64), rtol=1e-6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365, help="Days of 1m rows in the training CSV")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    compare_live(max(args.repeat, 10))
+    compare_training(args.days, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
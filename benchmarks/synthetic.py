@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+KLINE_COLUMNS = ['start_time','open','high','low','close','volume','end_time','volume_usd','n_trades','taker_volume','taker_volume_usd','ignore']
+INTERVAL_MS = 60_000
+
+
+def synthetic_klines(n_rows, start_ms=1_700_000_000_000, price=30000.0, seed=0):
+    """Random-walk 1m klines shaped like `download_binance_current_day_data` output."""
+    rng = np.random.default_rng(seed)
+    start_time = start_ms + INTERVAL_MS * np.arange(n_rows, dtype=np.int64)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.001, n_rows)))
+    open_ = np.concatenate([[price], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0005, n_rows)) * close
+    volume = rng.gamma(2.0, 5.0, n_rows)
+    taker_volume = volume * rng.uniform(0.3, 0.7, n_rows)
+    df = pd.DataFrame({
+        'start_time': start_time,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': volume,
+        'end_time': start_time + INTERVAL_MS - 1,
+        'volume_usd': volume * close,
+        'n_trades': rng.integers(50, 500, n_rows),
+        'taker_volume': taker_volume,
+        'taker_volume_usd': taker_volume * close,
+        'ignore': 0,
+    }, columns=KLINE_COLUMNS)
+    df['date'] = pd.to_datetime(df['end_time'] + 1, unit='ms')
+    return df
+
+
+def synthetic_price_frame(n_rows, seed=0):
+    """Merged BTC/ETH frame shaped like the one `format_data` builds before feature engineering."""
+    frames = []
+    for pair, price, offset in [("BTCUSDT", 30000.0, 0), ("ETHUSDT", 2000.0, 1)]:
+        df = synthetic_klines(n_rows, price=price, seed=seed + offset).drop(columns="ignore")
+        df = df.set_index("date").rename(columns=lambda x: f"{x}_{pair}")
+        frames.append(df)
+    return pd.concat(frames, axis=1)
+
+
+def write_daily_zips(pair, days, path, end_date=None, price=30000.0, seed=0, header=False):
+    """Write `days` Binance-format daily 1m kline zips for `pair` ending the day before `end_date`."""
+    import datetime
+    import os
+    import zipfile
+
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=days)
+    start_ms = int(pd.Timestamp(start_date).timestamp() * 1000)
+    klines = synthetic_klines(days * 1440, start_ms=start_ms, price=price, seed=seed).drop(columns="date")
+    os.makedirs(path, exist_ok=True)
+    files = []
+    for n in range(days):
+        day = start_date + datetime.timedelta(days=n)
+        name = f"{pair}-1m-{day}"
+        csv = klines.iloc[n * 1440:(n + 1) * 1440].to_csv(index=False, header=header)
+        file_name = os.path.join(path, f"{name}.zip")
+        with zipfile.ZipFile(file_name, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(f"{name}.csv", csv)
+        files.append(file_name)
+    return files
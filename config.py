@@ -7,6 +7,10 @@ load_dotenv()
 app_base_path = os.getenv("APP_BASE_PATH", default=os.getcwd())
 data_base_path = os.path.join(app_base_path, "data")
 model_file_path = os.path.join(data_base_path, "model.pkl")
+scaler_file_path = os.path.join(data_base_path, "scaler.pkl")
+models_path = os.path.join(data_base_path, "models")
+jobs_path = os.path.join(data_base_path, "jobs")
+metrics_path = os.path.join(data_base_path, "metrics")
 
 TOKEN = os.getenv("TOKEN").upper()
 TRAINING_DAYS = os.getenv("TRAINING_DAYS")
@@ -19,3 +23,63 @@ else:
     REGION = "com"
 DATA_PROVIDER = os.getenv("DATA_PROVIDER").lower()
 CG_API_KEY = os.getenv("CG_API_KEY", default=None)
+# Topics served by this node as comma-separated token:horizon:model entries, e.g.
+# "BTC:6h:KNN,ETH:6h:LinearRegression,SOL:1h:BayesianRidge"; the default is the single
+# TOKEN/MODEL topic. The first topic answers requests that do not name a horizon.
+TOPICS = os.getenv("TOPICS", default=f"{TOKEN}:6h:{MODEL}")
+# Training data store written by format_data: npy (memory-mapped), parquet or csv
+TRAINING_DATA_FORMAT = os.getenv("TRAINING_DATA_FORMAT", default="npy").lower()
+# dtype of the stored training feature matrix: float64, or float32 for half the memory
+FEATURE_DTYPE = os.getenv("FEATURE_DTYPE", default="float64").lower()
+# Processes used to decode daily zips in format_data
+FORMAT_WORKERS = int(os.getenv("FORMAT_WORKERS", default=os.cpu_count() or 1))
+# Hyperparameter search used by train_model for KNN and SVR: grid or halving,
+# optionally capped at a wall-clock budget in seconds (0 = no limit)
+SEARCH_STRATEGY = os.getenv("SEARCH_STRATEGY", default="grid").lower()
+SEARCH_BUDGET_SECONDS = float(os.getenv("SEARCH_BUDGET_SECONDS", default=0))
+# Neighbour index served for MODEL=KNN: auto (fastest of the ones below), kd_tree,
+# ball_tree, brute, or none to serve the index the fitted KNeighborsRegressor chose itself
+KNN_INDEX = os.getenv("KNN_INDEX", default="auto").lower()
+# Explicit kernel feature map used by SVR and KernelRidge instead of the exact n x n kernel:
+# none (exact), nystroem or rff (random Fourier features), with KERNEL_RANK components
+KERNEL_APPROXIMATION = os.getenv("KERNEL_APPROXIMATION", default="none").lower()
+KERNEL_RANK = int(os.getenv("KERNEL_RANK", default=500))
+# full refits every model on the whole window held in memory; incremental keeps running
+# moments of the npy store, folds in only the rows appended since the last run (and drops
+# the ones older than TRAINING_DAYS) TRAINING_CHUNK_ROWS at a time, and solves the linear
+# models from them
+TRAINING_MODE = os.getenv("TRAINING_MODE", default="full").lower()
+TRAINING_CHUNK_ROWS = int(os.getenv("TRAINING_CHUNK_ROWS", default=100000))
+
+# Seconds a live kline fetch is reused; entries also expire at the next 1m candle close
+LIVE_DATA_TTL = int(os.getenv("LIVE_DATA_TTL", default=60))
+# Per-pair HTTP timeout and overall deadline for the live fetches of one inference,
+# kept below gunicorn's 30s worker timeout
+LIVE_FETCH_TIMEOUT = float(os.getenv("LIVE_FETCH_TIMEOUT", default=10))
+LIVE_FETCH_DEADLINE = float(os.getenv("LIVE_FETCH_DEADLINE", default=20))
+
+# sync computes every /inference on request; precompute serves a forecast computed
+# in the background right after each 1m candle close
+SERVING_MODE = os.getenv("SERVING_MODE", default="sync").lower()
+# Seconds after a candle close before the precompute runs, and the age beyond which
+# a precomputed forecast is not served and /inference computes synchronously
+PRECOMPUTE_DELAY_SECONDS = float(os.getenv("PRECOMPUTE_DELAY_SECONDS", default=2))
+PRECOMPUTE_MAX_AGE = float(os.getenv("PRECOMPUTE_MAX_AGE", default=90))
+
+# Where live Binance klines come from: rest fetches them per request, stream keeps an
+# in-memory candle buffer current from the kline websocket (REST is the fallback)
+LIVE_DATA_SOURCE = os.getenv("LIVE_DATA_SOURCE", default="rest").lower()
+# Seconds without a websocket message after which the stream buffer is not served
+LIVE_STREAM_MAX_AGE = float(os.getenv("LIVE_STREAM_MAX_AGE", default=30))
+# Exchange endpoints, {region} is replaced by the region; override to point at a local fake exchange
+BINANCE_API_URL = os.getenv("BINANCE_API_URL", default="https://api.binance.{region}")
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", default="wss://stream.binance.{region}:9443")
+BINANCE_DATA_URL = os.getenv("BINANCE_DATA_URL", default="https://data.binance.vision")
+
+# Parallel historical downloads, and the most of them that run against one host at a time
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", default=16))
+DOWNLOAD_CONCURRENCY_PER_HOST = int(os.getenv("DOWNLOAD_CONCURRENCY_PER_HOST", default=8))
+
+# Print the live frames and feature rows on every inference; off by default because
+# formatting them costs more than the prediction and floods the logs
+VERBOSE = os.getenv("VERBOSE", default="false").lower() in ["1", "true", "yes"]
@@ -0,0 +1,264 @@
+import threading
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from topics import PAIRS, TOPICS
+
+LAG_METRICS = ["close", "volume", "log_return"]
+LAGS = 10
+VOLATILITY_WINDOW = 360
+
+
+def feature_names(pairs=PAIRS, lags=LAGS):
+    """Model input columns: lags of every pair, then their lagged 6h volatility, then the hour."""
+    return [
+        f"{metric}_{pair}_lag{lag}"
+        for pair in pairs
+        for metric in LAG_METRICS
+        for lag in range(1, lags + 1)
+    ] + [f"volatility_6h_{pair}_lag1" for pair in pairs] + ["hour_of_day"]
+
+
+FEATURES = feature_names()
+
+
+def lag_matrix(values, lags=LAGS):
+    """Return an (n, lags) array whose column j is `values` shifted down by j + 1 rows."""
+    padded = np.concatenate([np.full(lags, np.nan), values])
+    return sliding_window_view(padded, lags + 1)[:, lags - 1::-1][:len(values)]
+
+
+def derived_columns(pairs=PAIRS, lags=LAGS):
+    """Names of the columns `build_features` adds, in the order it adds them."""
+    names = []
+    for pair in pairs:
+        names += [f"log_return_{pair}", f"volatility_6h_{pair}"]
+        names += [f"{metric}_{pair}_lag{lag}" for metric in LAG_METRICS for lag in range(1, lags + 1)]
+        names.append(f"volatility_6h_{pair}_lag1")
+    return names + ["hour_of_day"]
+
+
+def build_features(price_df, pairs=PAIRS, lags=LAGS, window=VOLATILITY_WINDOW):
+    """Return `price_df` with the log return, 6h volatility, lag and hour-of-day columns added.
+
+    `price_df` is the merged frame with `close_<pair>` and `volume_<pair>` columns
+    and a DatetimeIndex. The float columns of `price_df` and every derived
+    column are written into one preallocated column-major array that pandas
+    adopts as a single block, so nothing is inserted column by column and the
+    result is never consolidated (copied) again. Non-float input columns come
+    first in the result, then the float input columns, then the features.
+    """
+    names = derived_columns(pairs, lags)[:-1]
+    existing = price_df.columns.intersection(names + ["hour_of_day"])
+    if len(existing):
+        price_df = price_df.drop(columns=existing)
+    float_columns = price_df.select_dtypes(include="float").columns
+    values = np.empty((len(float_columns) + len(names), len(price_df)))
+    for i, column in enumerate(float_columns):
+        values[i] = price_df[column].to_numpy()
+
+    row = len(float_columns)
+    for pair in pairs:
+        close = price_df[f"close_{pair}"].to_numpy(dtype=float)
+        volume = price_df[f"volume_{pair}"].to_numpy(dtype=float)
+        log_return = values[row]
+        log_return[:-1] = np.log(close[1:] / close[:-1])
+        log_return[-1:] = np.nan
+        volatility = values[row + 1]
+        volatility[:] = pd.Series(log_return).rolling(window=window).std().to_numpy() * np.sqrt(window)
+        row += 2
+        for metric in [close, volume, log_return]:
+            values[row:row + lags] = lag_matrix(metric, lags).T
+            row += lags
+        values[row] = lag_matrix(volatility, 1)[:, 0]
+        row += 1
+
+    floats = pd.DataFrame(values.T, index=price_df.index, columns=list(float_columns) + names, copy=False)
+    hour_of_day = pd.DataFrame({"hour_of_day": price_df.index.hour}, index=price_df.index)
+    return pd.concat([price_df.drop(columns=float_columns), floats, hour_of_day], axis=1, copy=False)
+
+
+def add_targets(price_df, topics=TOPICS, window=VOLATILITY_WINDOW):
+    """Add the target column of every topic to a frame returned by `build_features`.
+
+    A topic's target is the volatility of its pair over its horizon, scaled like
+    the 6h volatility feature. Topics sharing a target column compute it once,
+    and a horizon equal to the feature window reuses the feature column as is.
+    """
+    for topic in topics:
+        if topic.target in price_df.columns:
+            continue
+        if topic.window == window:
+            price_df[topic.target] = price_df[f"volatility_6h_{topic.pair}"]
+        else:
+            log_return = price_df[f"log_return_{topic.pair}"]
+            price_df[topic.target] = log_return.rolling(window=topic.window).std() * np.sqrt(topic.window)
+    return price_df
+
+
+class RingBuffer:
+    """Fixed-size float64 buffer holding the most recent values pushed."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = np.full(size, np.nan)
+        self.count = 0
+
+    def push(self, value):
+        evicted = self.values[self.count % self.size]
+        self.values[self.count % self.size] = value
+        self.count += 1
+        return evicted
+
+    def recent(self, n, skip=0):
+        """Return the n values before the newest `skip` ones, newest first."""
+        idx = (self.count - 1 - skip - np.arange(n)) % self.size
+        return self.values[idx]
+
+    def ordered(self):
+        n = min(self.count, self.size)
+        return self.values[(self.count - n + np.arange(n)) % self.size]
+
+
+class RollingVariance:
+    """Sample variance over a sliding window, updated in O(1) per value.
+
+    Uses Welford's add/remove updates and recomputes exactly from the window
+    once per `size` updates so rounding error cannot build up in a long-running
+    server.
+    """
+
+    def __init__(self, size):
+        self.window = RingBuffer(size)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, value):
+        evicted = self.window.push(value)
+        if self.n == self.window.size:
+            self.n -= 1
+            delta = evicted - self.mean
+            self.mean -= delta / self.n
+            self.m2 -= delta * (evicted - self.mean)
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        if self.window.count % self.window.size == 0:
+            values = self.window.ordered()
+            self.mean = values.mean()
+            self.m2 = ((values - self.mean) ** 2).sum()
+
+    def variance(self):
+        if self.n < self.window.size:
+            return np.nan
+        return max(self.m2, 0.0) / (self.n - 1)
+
+
+class _PairState:
+    def __init__(self, lags, window):
+        self.close = RingBuffer(lags + 1)
+        self.volume = RingBuffer(lags + 1)
+        self.log_return = RingBuffer(lags)
+        self.volatility = RollingVariance(window)
+
+    def push(self, close, volume):
+        if self.close.count:
+            log_return = np.log(close / self.close.recent(1)[0])
+            self.log_return.push(log_return)
+            self.volatility.push(log_return)
+        self.close.push(close)
+        self.volume.push(volume)
+
+
+class FeatureEngine:
+    """Stateful, incremental version of the live feature pipeline.
+
+    Candles are pushed one at a time into per-pair ring buffers and a rolling
+    variance accumulator, so producing the newest feature vector costs
+    O(features) instead of rebuilding every column over the whole frame. The
+    output matches the last row of `build_features` on the same live frame:
+    the newest kline of each fetch is still open and is only used as the
+    "next" candle, exactly like the `shift(-1)` + `dropna` there.
+    """
+
+    def __init__(self, pairs=PAIRS, lags=LAGS, window=VOLATILITY_WINDOW):
+        self.pairs = pairs
+        self.lags = lags
+        self.window = window
+        self.columns = feature_names(pairs, lags)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._state = {pair: _PairState(self.lags, self.window) for pair in self.pairs}
+        self.last_timestamp = None
+        self.count = 0
+
+    def push(self, timestamp, closes, volumes):
+        """Commit one closed candle; `closes` and `volumes` are keyed by pair."""
+        for pair in self.pairs:
+            self._state[pair].push(closes[pair], volumes[pair])
+        self.last_timestamp = timestamp
+        self.count += 1
+
+    @property
+    def ready(self):
+        # Row k needs the volatility of row k-1, i.e. a full window of log returns before it
+        return self.count > self.window and self.count > self.lags
+
+    def latest(self):
+        """Return the feature vector of the newest committed candle as a one-row DataFrame."""
+        if not self.ready:
+            raise ValueError(f"Not enough live data for features: {self.count} candles, need {self.window + 1}")
+        values = []
+        for pair in self.pairs:
+            state = self._state[pair]
+            values.append(state.close.recent(self.lags, skip=1))
+            values.append(state.volume.recent(self.lags, skip=1))
+            values.append(state.log_return.recent(self.lags))
+        # The accumulator covers log returns up to row k-1, i.e. volatility_6h lag 1
+        values.append([np.sqrt(self._state[pair].volatility.variance()) * np.sqrt(self.window) for pair in self.pairs])
+        timestamp = pd.Timestamp(int(self.last_timestamp))
+        values.append([timestamp.hour])
+        return pd.DataFrame([np.concatenate(values)], columns=self.columns, index=[timestamp])
+
+    def ingest(self, frames):
+        """Push the candles of `frames` (pair -> kline DataFrame) that are newer than the
+        last committed one and return the latest feature vector.
+
+        If the frames do not overlap the engine's history (first call, a gap, or
+        data that went backwards), the engine is rebuilt from the frames.
+        """
+        arrays = {}
+        common = None
+        for pair in self.pairs:
+            df = frames[pair]
+            dates = df.index if "date" not in df.columns else df["date"]
+            timestamps = pd.DatetimeIndex(dates).asi8
+            order = np.argsort(timestamps, kind="stable")
+            arrays[pair] = (
+                timestamps[order],
+                df["close"].to_numpy(dtype=float)[order],
+                df["volume"].to_numpy(dtype=float)[order],
+            )
+            common = timestamps if common is None else np.intersect1d(common, timestamps)
+        common = np.unique(common)
+        # The newest candle is still open; it only serves as the next close of the row before it
+        closed = common[:-1]
+        positions = {pair: np.searchsorted(arrays[pair][0], closed) for pair in self.pairs}
+
+        with self._lock:
+            start = 0
+            if self.last_timestamp is not None:
+                pos = np.searchsorted(closed, self.last_timestamp)
+                if pos < len(closed) and closed[pos] == self.last_timestamp:
+                    start = pos + 1
+                else:
+                    self.reset()
+            for i in range(start, len(closed)):
+                closes = {pair: arrays[pair][1][positions[pair][i]] for pair in self.pairs}
+                volumes = {pair: arrays[pair][2][positions[pair][i]] for pair in self.pairs}
+                self.push(closed[i], closes, volumes)
+            return self.latest()
@@ -1,4 +1,9 @@
 # Gunicorn config variables
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "app:app"
 loglevel = "info"
 errorlog = "-"  # stderr
 accesslog = "-"  # stdout
@@ -6,7 +11,28 @@ worker_tmp_dir = "/dev/shm"
 graceful_timeout = 120
 timeout = 30
 keepalive = 5
+# Features and predict are CPU-bound and hold the GIL, so they scale with worker processes;
+# the threads of each worker overlap the waits on live fetches
 worker_class = "gthread"
-workers = 1
-threads = 8
-bind = "0.0.0.0:9000"
+workers = int(os.getenv("GUNICORN_WORKERS", default=multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", default=4))
+bind = os.getenv("GUNICORN_BIND", default="0.0.0.0:8000")
+
+# The master imports app.py once and loads the model artifacts (see app.preload_models);
+# forked workers share those pages copy-on-write instead of each loading its own copy
+preload_app = True
+os.environ["GUNICORN_PRELOAD"] = "1"
+
+
+def pre_fork(server, worker):
+    # Objects loaded so far are never collected; keeps the collector from writing to the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import start_background_tasks, start_initial_update
+    start_background_tasks()
+    # The server listens before any model exists; the first worker trains one in its training
+    # process while requests get a 503, and every worker picks the new version up on its own
+    if worker.age == 1:
+        start_initial_update()
@@ -0,0 +1,172 @@
+import json
+import os
+import numpy as np
+from sklearn.linear_model import BayesianRidge, LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+# Models that train_model can fit from the moments alone with TRAINING_MODE=incremental
+INCREMENTAL_MODELS = ["LinearRegression", "BayesianRidge"]
+
+
+class Moments:
+    """Row count, column means and centered co-moment matrix of the [features, targets] rows.
+
+    Two sets of rows combine exactly with the pairwise update of Chan et al., and
+    a set can be taken out again the same way, so the statistics of the training
+    window are built one chunk at a time and moved along as days are appended to
+    the store and fall out of TRAINING_DAYS. They are all a linear model and its
+    `StandardScaler` need: memory is one chunk plus a columns x columns matrix,
+    whatever the number of rows.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.count = 0
+        self.mean = np.zeros(len(self.columns))
+        self.comoment = np.zeros((len(self.columns), len(self.columns)))
+
+    def _combine(self, count, mean, comoment, sign):
+        if sign > 0:
+            total = self.count + count
+            delta = mean - self.mean
+            self.mean = self.mean + delta * (count / total)
+            self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.count * count / total)
+            self.count = total
+            return
+        remaining = self.count - count
+        if remaining <= 0:
+            self.__init__(self.columns)
+            return
+        remaining_mean = (self.mean * self.count - mean * count) / remaining
+        delta = mean - remaining_mean
+        self.comoment = self.comoment - comoment - np.outer(delta, delta) * (remaining * count / self.count)
+        self.mean = remaining_mean
+        self.count = remaining
+
+    def fold(self, X, y, start, stop, chunk_rows, sign=1):
+        """Add (`sign` 1) or remove (-1) rows `start:stop` of `X` and `y`, `chunk_rows` at a time."""
+        for chunk_start in range(start, stop, chunk_rows):
+            chunk_stop = min(chunk_start + chunk_rows, stop)
+            values = np.hstack([
+                np.asarray(X[chunk_start:chunk_stop], dtype=np.float64),
+                np.asarray(y[chunk_start:chunk_stop], dtype=np.float64).reshape(chunk_stop - chunk_start, -1),
+            ])
+            mean = values.mean(axis=0)
+            values -= mean
+            self._combine(len(values), mean, values.T @ values, sign)
+        return self
+
+    def save(self, path, **meta):
+        # Plain arrays and a JSON string, so loading needs no pickle; replaced in one step,
+        # so a run killed mid-write leaves the previous file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, count=self.count, mean=self.mean, comoment=self.comoment,
+                 meta=json.dumps({"columns": self.columns, **meta}))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Return (moments, meta) saved by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            moments = cls(meta.pop("columns"))
+            moments.count = int(data["count"])
+            moments.mean = data["mean"]
+            moments.comoment = data["comoment"]
+        return moments, meta
+
+
+def fit_scaler(moments, n_features):
+    """`StandardScaler` of the first `n_features` columns, as fitted on every row of `moments`."""
+    mean = moments.mean[:n_features]
+    var = np.maximum(np.diag(moments.comoment)[:n_features] / moments.count, 0)
+    scaler = StandardScaler()
+    scaler.mean_, scaler.var_ = mean, var
+    # Constant features keep a scale of 1, as in StandardScaler.fit
+    constant = var <= (moments.count * np.finfo(np.float64).eps * mean) ** 2
+    scaler.scale_ = np.where(constant, 1.0, np.sqrt(var))
+    scaler.n_samples_seen_ = moments.count
+    scaler.n_features_in_ = n_features
+    # Live features are scaled as DataFrames, like the scaler fitted on the stored frame
+    scaler.feature_names_in_ = np.asarray(moments.columns[:n_features], dtype=object)
+    return scaler
+
+
+def _standardized(moments, n_features, target):
+    """Gram matrix of the standardized features, their products with the centered target, and its sum of squares."""
+    scale = fit_scaler(moments, n_features).scale_
+    gram = moments.comoment[:n_features, :n_features] / np.outer(scale, scale)
+    xy = moments.comoment[:n_features, target] / scale
+    return gram, xy, moments.comoment[target, target]
+
+
+def _sse(gram, xy, yy, coef):
+    return max(yy - 2 * coef @ xy + coef @ gram @ coef, 0.0)
+
+
+def fit_linear_regression(moments, n_features, target):
+    """`LinearRegression` on the standardized features, solved from the normal equations."""
+    gram, xy, _ = _standardized(moments, n_features, target)
+    model = LinearRegression()
+    model.coef_ = np.linalg.lstsq(gram, xy, rcond=None)[0]
+    # The standardized features have mean 0, so the intercept is the target mean
+    model.intercept_ = float(moments.mean[target])
+    model.n_features_in_ = n_features
+    return model
+
+
+def fit_bayesian_ridge(moments, n_features, target, model=None):
+    """`BayesianRidge` on the standardized features, with the evidence updates of `BayesianRidge.fit`.
+
+    The SVD of the centered features that `fit` iterates on is replaced by the
+    eigendecomposition of their Gram matrix, which has the same eigenvalues and
+    right singular vectors.
+    """
+    model = model or BayesianRidge()
+    gram, xy, yy = _standardized(moments, n_features, target)
+    eigen_vals, vectors = np.linalg.eigh(gram)
+    eigen_vals = np.maximum(eigen_vals, 0)
+    n_samples = moments.count
+    eps = np.finfo(np.float64).eps
+    alpha_ = model.alpha_init if model.alpha_init is not None else 1.0 / (yy / n_samples + eps)
+    lambda_ = model.lambda_init if model.lambda_init is not None else 1.0
+
+    def update_coef(alpha_, lambda_):
+        coef = vectors @ ((vectors.T @ xy) / (eigen_vals + lambda_ / alpha_))
+        return coef, _sse(gram, xy, yy, coef)
+
+    coef_old = None
+    for iteration in range(model.max_iter):
+        coef, sse = update_coef(alpha_, lambda_)
+        gamma_ = np.sum((alpha_ * eigen_vals) / (lambda_ + alpha_ * eigen_vals))
+        lambda_ = (gamma_ + 2 * model.lambda_1) / (np.sum(coef ** 2) + 2 * model.lambda_2)
+        alpha_ = (n_samples - gamma_ + 2 * model.alpha_1) / (sse + 2 * model.alpha_2)
+        if iteration != 0 and np.sum(np.abs(coef_old - coef)) < model.tol:
+            break
+        coef_old = coef
+
+    model.n_iter_ = iteration + 1
+    model.alpha_, model.lambda_ = alpha_, lambda_
+    model.coef_, _ = update_coef(alpha_, lambda_)
+    model.sigma_ = vectors @ (vectors.T / (alpha_ * eigen_vals + lambda_)[:, None])
+    model.scores_ = []
+    model.X_offset_, model.X_scale_ = np.zeros(n_features), np.ones(n_features)
+    model.intercept_ = float(moments.mean[target])
+    model.n_features_in_ = n_features
+    return model
+
+
+def fit_incremental(model_name, moments, n_features, target):
+    """Fit `model_name` (one of INCREMENTAL_MODELS) for target column `target` of `moments`."""
+    if model_name == "LinearRegression":
+        return fit_linear_regression(moments, n_features, target)
+    if model_name == "BayesianRidge":
+        return fit_bayesian_ridge(moments, n_features, target)
+    raise ValueError(f"{model_name} cannot be trained incrementally, use one of {INCREMENTAL_MODELS}")
+
+
+def training_scores(model, moments, n_features, target):
+    """(RMSE, R²) of `model` over every row of `moments`, without another pass over the rows."""
+    gram, xy, yy = _standardized(moments, n_features, target)
+    sse = _sse(gram, xy, yy, model.coef_)
+    return float(np.sqrt(sse / moments.count)), float(1 - sse / yy) if yy else 0.0
@@ -0,0 +1,113 @@
+import glob
+import io
+import os
+from zipfile import ZipFile
+import numpy as np
+import pandas as pd
+from multiprocess import Pool
+from schema import KLINE_COLUMNS, KLINE_DTYPES
+from config import FORMAT_WORKERS
+
+def parse_binance_zip(zip_file_path):
+    """Parse one Binance daily kline zip into a frame indexed by candle end time."""
+    with ZipFile(zip_file_path) as myzip:
+        raw = myzip.read(myzip.filelist[0])
+    df = pd.read_csv(
+        io.BytesIO(raw),
+        header=None,
+        skiprows=1 if raw.startswith(b"open_time") else 0,
+        usecols=range(len(KLINE_COLUMNS)),
+        names=KLINE_COLUMNS,
+        dtype=KLINE_DTYPES,
+    )
+    max_time = df["end_time"].max()
+    if max_time > 1e17:  # Nanoseconds
+        df["date"] = pd.to_datetime(df["end_time"], unit="ns")
+    elif max_time > 1e14:  # Microseconds, used by Binance spot files since 2025
+        df["date"] = pd.to_datetime(df["end_time"], unit="us")
+    else:  # Milliseconds
+        df["date"] = pd.to_datetime(df["end_time"], unit="ms")
+    return df.set_index("date")
+
+
+def parsed_file_path(zip_file_path):
+    name = os.path.basename(zip_file_path).replace(".zip", ".npz")
+    return os.path.join(os.path.dirname(zip_file_path), "parsed", name)
+
+
+def day_of(path):
+    # BTCUSDT-1m-2024-01-31.zip -> 2024-01-31
+    return os.path.basename(path).rsplit(".", 1)[0][-10:]
+
+
+def save_parsed_day(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, date=df.index.asi8, **{column: df[column].to_numpy() for column in KLINE_COLUMNS})
+    os.replace(tmp_path, path)
+
+
+def load_parsed_days(paths):
+    """Load per-day caches and merge them into one frame with a single concatenation."""
+    if not paths:
+        return pd.DataFrame(columns=KLINE_COLUMNS)
+    columns = {column: [] for column in ["date"] + KLINE_COLUMNS}
+    for path in paths:
+        with np.load(path) as day:
+            for column in columns:
+                columns[column].append(day[column])
+    data = {column: np.concatenate(parts) for column, parts in columns.items()}
+    index = pd.DatetimeIndex(data.pop("date").view("datetime64[ns]"), name="date")
+    return pd.DataFrame(data, index=index)
+
+
+def parse_to_cache(zip_file_path):
+    """Parse one zip into its per-day cache; runs in the ingestion worker processes."""
+    try:
+        df = parse_binance_zip(zip_file_path)
+        save_parsed_day(df, parsed_file_path(zip_file_path))
+        return zip_file_path, len(df), None
+    except Exception as e:
+        return zip_file_path, 0, str(e)
+
+
+def update_parsed_days(pairs, data_path, workers=FORMAT_WORKERS):
+    """Parse every daily zip of `pairs` that has no up-to-date per-day cache yet.
+
+    Stale zips are decoded in parallel by `workers` processes. Returns
+    {pair: {day: cache path}} for all days that are available, oldest first.
+    """
+    zips = {pair: sorted(glob.glob(os.path.join(data_path, f"{pair}-1m-*.zip"))) for pair in pairs}
+    stale = [
+        zip_file_path
+        for paths in zips.values()
+        for zip_file_path in paths
+        if not os.path.exists(parsed_file_path(zip_file_path))
+        or os.path.getmtime(parsed_file_path(zip_file_path)) < os.path.getmtime(zip_file_path)
+    ]
+
+    failed = set()
+    if stale:
+        workers = max(1, min(workers, len(stale)))
+        print(f"Parsing {len(stale)} daily files with {workers} workers")
+        if workers == 1:
+            results = map(parse_to_cache, stale)
+        else:
+            pool = Pool(workers)
+            results = pool.imap_unordered(parse_to_cache, stale, chunksize=max(1, len(stale) // (workers * 4)))
+        try:
+            for zip_file_path, rows, error in results:
+                if error:
+                    print(f"Error processing {zip_file_path}: {error}")
+                    failed.add(zip_file_path)
+                else:
+                    print(f"Processed {zip_file_path} with {rows} rows")
+        finally:
+            if workers > 1:
+                pool.close()
+                pool.join()
+
+    return {
+        pair: {day_of(path): parsed_file_path(path) for path in paths if path not in failed}
+        for pair, paths in zips.items()
+    }
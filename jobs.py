@@ -0,0 +1,121 @@
+import fcntl
+import json
+import multiprocessing
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from config import jobs_path
+
+_lock = threading.Lock()
+_executor = None
+_active_job = None
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _status_path(job_id):
+    return os.path.join(jobs_path, f"{job_id}.json")
+
+
+def _write_status(job_id, **fields):
+    os.makedirs(jobs_path, exist_ok=True)
+    status = job_status(job_id) or {"id": job_id}
+    status.update(fields)
+    tmp_path = f"{_status_path(job_id)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, _status_path(job_id))
+
+
+def job_status(job_id):
+    """Return the status dict of a job, or None if it is unknown.
+
+    Status lives in files under the data directory so any worker process can answer it.
+    """
+    try:
+        with open(_status_path(job_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _run_update_job(job_id):
+    # Runs in the training process, never in a serving worker
+    from model import update_data
+    import metrics
+    # The training process is reused across jobs; each job hands back only its own timings
+    metrics.registry.reset()
+    os.makedirs(jobs_path, exist_ok=True)
+    # Every gunicorn worker has its own training process; the lock runs their jobs one at a time
+    with open(os.path.join(jobs_path, "update.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _write_status(job_id, status="running", started_at=_now())
+        try:
+            update_data()
+        except Exception as e:
+            traceback.print_exc()
+            _write_status(job_id, status="failed", finished_at=_now(), error=str(e))
+        else:
+            _write_status(job_id, status="succeeded", finished_at=_now())
+    return metrics.registry.snapshot()
+
+
+def _new_executor():
+    # A spawned process does not inherit the server's threads or locks
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _job_done(job_id, future):
+    global _active_job, _executor
+    with _lock:
+        if _active_job == job_id:
+            _active_job = None
+        if isinstance(future.exception(), BrokenProcessPool) and _executor is not None:
+            # The training process died (killed, out of memory); the next job gets a new one
+            _executor.shutdown(wait=False)
+            _executor = None
+    if future.exception() is not None:
+        _write_status(job_id, status="failed", finished_at=_now(), error=str(future.exception()))
+    else:
+        # Download, format and train spans of the job show up on this server's /metrics
+        import metrics
+        metrics.registry.merge(future.result())
+        # Load the new artifacts now so the first inference after the swap does not pay for them
+        from registry import model_registries
+        for key, registry in model_registries.items():
+            try:
+                registry.get()
+            except Exception as e:
+                print(f"Could not preload new model artifact for {key}: {str(e)}")
+
+
+def submit_update_job():
+    """Queue a download + format + train run in the background training process.
+
+    Returns the job id. While a job from this process is queued or running its
+    id is returned instead of queueing another one.
+    """
+    global _executor, _active_job
+    with _lock:
+        if _active_job is not None:
+            return _active_job
+        if _executor is None:
+            _executor = _new_executor()
+        job_id = uuid.uuid4().hex[:12]
+        _write_status(job_id, status="queued", submitted_at=_now())
+        try:
+            future = _executor.submit(_run_update_job, job_id)
+        except BrokenProcessPool:
+            # Broken before the failed job's callback replaced it
+            _executor.shutdown(wait=False)
+            _executor = _new_executor()
+            future = _executor.submit(_run_update_job, job_id)
+        _active_job = job_id
+    future.add_done_callback(lambda f: _job_done(job_id, f))
+    return job_id
@@ -0,0 +1,110 @@
+from abc import ABCMeta, abstractmethod
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import Ridge
+from sklearn.svm import LinearSVR
+
+KERNEL_APPROXIMATIONS = ["none", "nystroem", "rff"]
+
+
+def _feature_map(kernel, gamma, method, n_components, random_state, X):
+    """Fitted explicit feature map whose inner products approximate `kernel`, or None for the linear kernel."""
+    if kernel == "linear":
+        return None
+    if gamma == "scale":
+        # The same default as SVR(gamma="scale")
+        gamma = 1.0 / (X.shape[1] * X.var()) if X.var() else 1.0
+    if method == "nystroem":
+        feature_map = Nystroem(kernel=kernel, gamma=gamma, n_components=min(n_components, len(X)), random_state=random_state)
+    elif method == "rff":
+        if kernel != "rbf":
+            raise ValueError(f"Random Fourier features only approximate the rbf kernel, not {kernel}")
+        feature_map = RBFSampler(gamma=gamma if gamma is not None else 1.0 / X.shape[1], n_components=n_components, random_state=random_state)
+    else:
+        raise ValueError(f"Unsupported kernel approximation: {method}")
+    return feature_map.fit(X)
+
+
+class _ApproximateKernelModel(RegressorMixin, BaseEstimator, metaclass=ABCMeta):
+    """A linear model fitted on an explicit, rank-`n_components` approximation of the kernel.
+
+    Training builds an n x `n_components` feature matrix instead of the n x n
+    kernel matrix, so memory and time grow linearly with the rows. Prediction maps
+    a row to `n_components` features and takes one dot product, independent of
+    the number of training rows. `method` is `nystroem` (kernel columns of a
+    random subset of rows) or `rff` (random Fourier features, rbf only). The
+    linear kernel needs no approximation and is solved exactly.
+    """
+
+    @abstractmethod
+    def _linear_model(self):
+        """Unfitted linear estimator that `fit` trains on the approximate kernel features."""
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        self.feature_map_ = _feature_map(self.kernel, self.gamma, self.method, self.n_components, self.random_state, X)
+        features = self._features(X)
+        if self._nystroem_rbf():
+            features = features @ self.feature_map_.normalization_.T
+        self.linear_model_ = self._linear_model().fit(features, np.asarray(y, dtype=np.float64))
+        coef = np.ravel(self.linear_model_.coef_)
+        # Folding the Nystroem normalization into the coefficients leaves one dot product per row to predict
+        self.coef_ = self.feature_map_.normalization_.T @ coef if self._nystroem_rbf() else coef
+        self.intercept_ = float(np.ravel(self.linear_model_.intercept_)[0])
+        return self
+
+    def _nystroem_rbf(self):
+        return isinstance(self.feature_map_, Nystroem) and self.feature_map_.kernel == "rbf"
+
+    def _features(self, X):
+        # The rbf maps are evaluated directly; sklearn's input validation costs more than the math for one row
+        feature_map = self.feature_map_
+        if feature_map is None:
+            return X
+        if isinstance(feature_map, RBFSampler):
+            features = X @ feature_map.random_weights_ + feature_map.random_offset_
+            np.cos(features, out=features)
+            return features * np.sqrt(2.0 / feature_map.n_components)
+        if self._nystroem_rbf():
+            # Kernel values against the landmark rows, before the normalization
+            components = feature_map.components_
+            gamma = feature_map.gamma if feature_map.gamma is not None else 1.0 / X.shape[1]
+            distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ components.T + (components ** 2).sum(axis=1)[None, :]
+            return np.exp(-gamma * np.maximum(distances, 0))
+        return feature_map.transform(X)
+
+    def predict(self, X):
+        return self._features(np.asarray(X, dtype=np.float64)) @ self.coef_ + self.intercept_
+
+
+class ApproximateKernelRidge(_ApproximateKernelModel):
+    """`KernelRidge` counterpart: ridge regression without intercept on the approximate feature map."""
+
+    def __init__(self, alpha=1.0, kernel="linear", gamma=None, method="nystroem", n_components=500, random_state=0):
+        self.alpha = alpha
+        self.kernel = kernel
+        self.gamma = gamma
+        self.method = method
+        self.n_components = n_components
+        self.random_state = random_state
+
+    def _linear_model(self):
+        # KernelRidge fits no intercept, so neither does its primal form
+        return Ridge(alpha=self.alpha, fit_intercept=False)
+
+
+class ApproximateSVR(_ApproximateKernelModel):
+    """`SVR` counterpart: epsilon-insensitive linear SVR on the approximate feature map."""
+
+    def __init__(self, C=1.0, epsilon=0.1, kernel="rbf", gamma="scale", method="nystroem", n_components=500, random_state=0):
+        self.C = C
+        self.epsilon = epsilon
+        self.kernel = kernel
+        self.gamma = gamma
+        self.method = method
+        self.n_components = n_components
+        self.random_state = random_state
+
+    def _linear_model(self):
+        return LinearSVR(C=self.C, epsilon=self.epsilon, loss="epsilon_insensitive", dual=True, max_iter=10000, random_state=self.random_state)
@@ -0,0 +1,168 @@
+import time
+import numpy as np
+
+# Tree kinds of sklearn.neighbors, imported only when an index of that kind is built or loaded
+INDEX_KINDS = ["kd_tree", "ball_tree"]
+LEAF_SIZES = [16, 32, 64, 128]
+# Query rows x training rows x features held at once by a manhattan brute search
+_MANHATTAN_BLOCK = 2**22
+
+
+class BruteIndex:
+    """Exhaustive search with the same `query` interface as the sklearn trees.
+
+    Euclidean and manhattan distances are computed with NumPy, so serving a
+    brute index needs no sklearn import; other metrics use `pairwise_distances`.
+    """
+
+    def __init__(self, X, metric="euclidean", **metric_params):
+        self.data = np.ascontiguousarray(X, dtype=np.float64)
+        self.metric = metric
+        self.metric_params = metric_params
+        self.squared_norms = (self.data ** 2).sum(axis=1)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Indexes pickled before the norms were cached still load
+        if "squared_norms" not in state:
+            self.squared_norms = (self.data ** 2).sum(axis=1)
+
+    def distances(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.metric == "euclidean" and not self.metric_params:
+            # The expansion sklearn's euclidean_distances uses
+            squared = (X ** 2).sum(axis=1)[:, None] - 2 * X @ self.data.T + self.squared_norms[None, :]
+            return np.sqrt(np.maximum(squared, 0))
+        if self.metric == "manhattan" and not self.metric_params:
+            rows = max(1, _MANHATTAN_BLOCK // self.data.size)
+            return np.vstack([np.abs(X[start:start + rows, None, :] - self.data[None, :, :]).sum(axis=2) for start in range(0, len(X), rows)])
+        from sklearn.metrics import pairwise_distances
+        return pairwise_distances(X, self.data, metric=self.metric, **self.metric_params)
+
+    def query(self, X, k):
+        distances = self.distances(X)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1, kind="stable")
+        return np.take_along_axis(nearest_distances, order, axis=1), np.take_along_axis(nearest, order, axis=1)
+
+
+def _build(kind, leaf_size, X, metric, metric_params):
+    if kind == "brute":
+        return BruteIndex(X, metric, **metric_params)
+    from sklearn.neighbors import BallTree, KDTree
+    return {"kd_tree": KDTree, "ball_tree": BallTree}[kind](X, leaf_size=leaf_size, metric=metric, **metric_params)
+
+
+def tree_state(tree):
+    """(arrays, params) of a fitted KDTree or BallTree that `_restore` turns back into the same tree."""
+    import sklearn
+    _, idx_array, node_data, node_bounds, _, n_levels, n_nodes = tree.__getstate__()[:7]
+    # The state layout is private to sklearn, so it is only restored by the version that wrote it
+    return {"idx_array": idx_array, "node_data": node_data, "node_bounds": node_bounds}, {
+        "n_levels": n_levels, "n_nodes": n_nodes, "sklearn_version": sklearn.__version__,
+    }
+
+
+def _restore(kind, leaf_size, X, metric, metric_params, tree_arrays, tree_params):
+    """The tree saved by `tree_state`, or None if this sklearn version cannot take its state back."""
+    import sklearn
+    from sklearn.metrics import DistanceMetric
+    from sklearn.neighbors import BallTree, KDTree
+    if tree_params.get("sklearn_version") != sklearn.__version__:
+        print(f"KNN tree saved by scikit-learn {tree_params.get('sklearn_version')}, rebuilding it for {sklearn.__version__}")
+        return None
+    tree_class = {"kd_tree": KDTree, "ball_tree": BallTree}[kind]
+    tree = tree_class.__new__(tree_class)
+    try:
+        # The tuple of BinaryTree.__getstate__, with the query counters reset
+        tree.__setstate__((
+            X, tree_arrays["idx_array"], tree_arrays["node_data"], tree_arrays["node_bounds"], leaf_size,
+            tree_params["n_levels"], tree_params["n_nodes"], 0, 0, 0, 0,
+            DistanceMetric.get_metric(metric, dtype=np.float64, **metric_params), None,
+        ))
+    except Exception as e:
+        print(f"Could not restore the saved KNN tree, rebuilding it: {str(e)}")
+        return None
+    return tree
+
+
+class KNNIndex:
+    """Serving engine for a fitted `KNeighborsRegressor` backed by a prebuilt neighbour index.
+
+    The tree over the training rows is built once at training time and saved with
+    the artifact, so serving loads the index instead of refitting or searching the
+    raw training matrix. Predictions average the targets of the `n_neighbors`
+    nearest rows exactly as `KNeighborsRegressor.predict` does, for both `uniform`
+    and `distance` weighting.
+    """
+
+    def __init__(self, index, y, n_neighbors, weights, kind, leaf_size, metric="euclidean", metric_params=None):
+        self.index = index
+        self.y = np.asarray(y, dtype=np.float64)
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.kind = kind
+        self.leaf_size = leaf_size
+        self.metric = metric
+        self.metric_params = metric_params or {}
+
+    @classmethod
+    def from_regressor(cls, model, X, y, queries, leaf_sizes=LEAF_SIZES, kinds=("kd_tree", "ball_tree", "brute")):
+        """Build an index for `model`'s metric over the training rows `X`.
+
+        Every index kind and leaf size is timed on `queries` (rows shaped like the
+        ones served, one at a time) and the fastest is kept.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        queries = np.asarray(queries, dtype=np.float64)
+        metric = model.effective_metric_
+        metric_params = dict(model.effective_metric_params_)
+        best = None
+        for kind in kinds:
+            for leaf_size in (leaf_sizes if kind != "brute" else [None]):
+                start = time.perf_counter()
+                index = _build(kind, leaf_size, X, metric, metric_params)
+                build_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                for row in queries:
+                    index.query(row.reshape(1, -1), k=model.n_neighbors)
+                query_ms = (time.perf_counter() - start) / max(1, len(queries)) * 1e3
+                label = f"{kind} leaf_size {leaf_size}" if leaf_size else kind
+                print(f"  {label}: built in {build_seconds:.2f}s, {query_ms:.3f} ms per query")
+                if best is None or query_ms < best[0]:
+                    best = (query_ms, kind, leaf_size, index)
+        query_ms, kind, leaf_size, index = best
+        print(f"KNN index: {kind}{f' leaf_size {leaf_size}' if leaf_size else ''}, {query_ms:.3f} ms per query")
+        return cls(index, y, model.n_neighbors, model.weights, kind, leaf_size, metric, metric_params)
+
+    @classmethod
+    def from_arrays(cls, X, y, n_neighbors, weights, kind, leaf_size, metric, metric_params, tree_arrays=None, tree_params=None):
+        """Load the index exported by predictors.py over the training rows `X`.
+
+        A tree comes back from the node arrays of `tree_state` without refitting;
+        a brute index, or a tree exported without them or by another sklearn
+        version, is built over `X`.
+        """
+        index = None
+        if kind != "brute" and tree_arrays:
+            index = _restore(kind, leaf_size, X, metric, metric_params, tree_arrays, tree_params)
+        if index is None:
+            index = _build(kind, leaf_size, X, metric, metric_params)
+        return cls(index, y, n_neighbors, weights, kind, leaf_size, metric, metric_params)
+
+    def kneighbors(self, X):
+        return self.index.query(np.asarray(X, dtype=np.float64), k=self.n_neighbors)
+
+    def predict(self, X):
+        distances, neighbours = self.kneighbors(X)
+        targets = self.y[neighbours]
+        if self.weights == "uniform":
+            return targets.mean(axis=1)
+        # Same rule as sklearn: a query that matches training rows exactly uses only those rows
+        with np.errstate(divide="ignore"):
+            weights = 1.0 / distances
+        exact = np.isinf(weights)
+        exact_rows = exact.any(axis=1)
+        weights[exact_rows] = exact[exact_rows]
+        return (targets * weights).sum(axis=1) / weights.sum(axis=1)
@@ -0,0 +1,89 @@
+import threading
+import time
+from config import LIVE_DATA_TTL
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class LiveDataCache:
+    """Short-lived cache of live market data frames keyed by (provider, pair, region).
+
+    An entry expires after `ttl` seconds or at the next 1m candle close,
+    whichever comes first, so a cached frame never straddles a new candle.
+    Concurrent misses for the same key wait on the single in-flight fetch
+    instead of each calling the exchange. Every caller gets the cached frame
+    itself, not a copy, so it must not be modified in place.
+    """
+
+    def __init__(self, ttl, candle_seconds=60):
+        self.ttl = ttl
+        self.candle_seconds = candle_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _expiry(self, fetched_at):
+        candle_close = (int(fetched_at // self.candle_seconds) + 1) * self.candle_seconds
+        return min(fetched_at + self.ttl, candle_close)
+
+    def get(self, key, fetch):
+        if self.ttl <= 0:
+            return fetch()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self.hits += 1
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = _Flight()
+                self._inflight[key] = flight
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                flight.value = fetch()
+                with self._lock:
+                    self._entries[key] = (flight.value, self._expiry(time.time()))
+            except Exception as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight.done.set()
+        else:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
+
+
+live_data_cache = LiveDataCache(LIVE_DATA_TTL)
@@ -0,0 +1,172 @@
+"""Latency histograms of the serving and update stages, in the Prometheus text format.
+
+Code is timed with `span`:
+
+    with span("predict"):
+        ...
+
+which adds the elapsed seconds to the `node_stage_seconds{stage="predict"}`
+histogram. Spans may nest; a `fetch` span includes the `parse` of the
+response inside it. Each process keeps its own histograms. Serving processes
+write a snapshot to the data directory at most every FLUSH_SECONDS, and
+`/metrics` sums the snapshots of every live process, so a preforked server
+reports all of its workers whichever one answers the scrape. The update job
+runs in a separate process and hands its snapshot back when it finishes.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from config import metrics_path
+
+# Seconds; wide enough for a 1ms predict and a multi-minute training run
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+FLUSH_SECONDS = 5
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, documentation, labels, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(series[0]), series[1]] for key, series in self._series.items()]
+
+    def merge(self, snapshot, into=None):
+        series_map = self._series if into is None else into
+        for key, counts, total in snapshot:
+            series = series_map.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0])
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+        return series_map
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self, series_map):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key in sorted(series_map):
+            counts, total = series_map[key]
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.labels, key))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total!r}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, directory):
+        self.directory = directory
+        self.histograms = {}
+        self._flushed_at = 0.0
+
+    def histogram(self, name, documentation, labels):
+        self.histograms[name] = Histogram(name, documentation, labels)
+        return self.histograms[name]
+
+    def snapshot(self):
+        return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+    def merge(self, snapshot):
+        for name, series in snapshot.items():
+            if name in self.histograms:
+                histogram = self.histograms[name]
+                with histogram._lock:
+                    histogram.merge(series)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def flush(self, force=False):
+        """Write this process's snapshot for the other workers' /metrics, at most every FLUSH_SECONDS."""
+        now = time.time()
+        if not force and now - self._flushed_at < FLUSH_SECONDS:
+            return
+        self._flushed_at = now
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(os.getpid())}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, self._path(os.getpid()))
+
+    def _process_snapshots(self):
+        own = os.getpid()
+        yield self.snapshot()
+        try:
+            entries = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not entry.endswith(".json") or not entry[:-5].isdigit() or int(entry[:-5]) == own:
+                continue
+            pid = int(entry[:-5])
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                # Counts of exited workers are dropped, which Prometheus treats as a counter reset
+                os.remove(self._path(pid))
+                continue
+            except PermissionError:
+                pass
+            try:
+                with open(self._path(pid)) as f:
+                    yield json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+    def render(self):
+        """Prometheus text exposition of every live process's histograms."""
+        self.flush(force=True)
+        merged = {name: {} for name in self.histograms}
+        for snapshot in self._process_snapshots():
+            for name, series in snapshot.items():
+                if name in self.histograms:
+                    self.histograms[name].merge(series, merged[name])
+        lines = []
+        for name, histogram in self.histograms.items():
+            lines.extend(histogram.render(merged[name]))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(metrics_path)
+stage_seconds = registry.histogram(
+    "node_stage_seconds", "Seconds spent in each serving or update stage.", ["stage"])
+request_seconds = registry.histogram(
+    "node_request_seconds", "Seconds from request to response, by route and status.", ["route", "status"])
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block into node_stage_seconds{stage=...}, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage)
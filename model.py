@@ -1,33 +1,43 @@
 import json
 import os
-import pickle
-from zipfile import ZipFile
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score, make_scorer
-from sklearn.linear_model import LinearRegression, BayesianRidge
-from sklearn.svm import SVR
-from sklearn.kernel_ridge import KernelRidge
-from updater import download_binance_daily_data, download_binance_current_day_data, download_coingecko_data, download_coingecko_current_day_data
-from config import data_base_path, model_file_path, TOKEN, TIMEFRAME, TRAINING_DAYS, REGION, DATA_PROVIDER, MODEL
+from updater import download_binance_daily_data, download_binance_current_day_data, download_coingecko_data, download_coingecko_current_day_data, fetch_concurrently
+from registry import registry_for, topic_root, save_artifacts, load_json_artifact, MODEL_FILE, SCALER_FILE, BEST_PARAMS_FILE, SEARCH_REPORT_FILE
+from live_cache import live_data_cache
+from stream import StreamNotReady, market_stream
+from features import FEATURES, VOLATILITY_WINDOW, FeatureEngine, add_targets, build_features
+from topics import PAIRS, TOPICS, find_topic
+from store import append_training_data, moments_path, read_manifest, read_training_data, stored_last_timestamp, training_data_exists, training_data_path, window_start, write_training_data
+from metrics import span
+# The estimators, the search and the training data parsing are imported by the training
+# functions that use them, so a serving process loads none of them
+from config import data_base_path, TOKEN, TIMEFRAME, TRAINING_DAYS, REGION, DATA_PROVIDER, CG_API_KEY, TRAINING_DATA_FORMAT, LIVE_FETCH_TIMEOUT, LIVE_FETCH_DEADLINE, SEARCH_STRATEGY, SEARCH_BUDGET_SECONDS, KNN_INDEX, KERNEL_APPROXIMATION, KERNEL_RANK, TRAINING_MODE, TRAINING_CHUNK_ROWS, LIVE_DATA_SOURCE, VERBOSE
 
 binance_data_path = os.path.join(data_base_path, "binance")
 coingecko_data_path = os.path.join(data_base_path, "coingecko")
-training_price_data_path = os.path.join(data_base_path, "price_data.csv")
-scaler_file_path = os.path.join(data_base_path, "scaler.pkl")
+# Live features are updated incrementally from the candles each fetch adds
+feature_engine = FeatureEngine()
+
+def update_data():
+    print("Starting data update process...")
+    # Every pair is downloaded once, however many topics use it
+    with span("download"):
+        files = {pair: download_data(pair.removesuffix("USDT"), TRAINING_DAYS, REGION, DATA_PROVIDER) for pair in PAIRS}
+    with span("format"):
+        format_data(files, DATA_PROVIDER)
+    with span("train"):
+        train_model(TIMEFRAME)
 
 def download_data_binance(token, training_days, region):
-    files = download_binance_daily_data(f"{token}USDT", training_days, region, binance_data_path)
-    print(f"Downloaded {len(files)} new files for {token}USDT")
-    return files
+    report = download_binance_daily_data(f"{token}USDT", training_days, region, binance_data_path)
+    print(f"Downloaded {len(report.files)} new files for {token}USDT")
+    return report.files
 
 def download_data_coingecko(token, training_days):
-    files = download_coingecko_data(token, training_days, coingecko_data_path, CG_API_KEY)
-    print(f"Downloaded {len(files)} new files")
-    return files
+    report = download_coingecko_data(token, training_days, coingecko_data_path, CG_API_KEY)
+    print(f"Downloaded {len(report.files)} new files")
+    return report.files
 
 def download_data(token, training_days, region, data_provider):
     if data_provider == "coingecko":
@@ -37,242 +47,277 @@ def download_data(token, training_days, region, data_provider):
     else:
         raise ValueError("Unsupported data provider")
 
-def format_data(files_btc, files_eth, data_provider):
-    print(f"Raw files for BTCUSDT: {files_btc[:5]}")
-    print(f"Raw files for ETHUSDT: {files_eth[:5]}")
-    print(f"Files for BTCUSDT: {len(files_btc)}, Files for ETHUSDT: {len(files_eth)}")
-    if not files_btc or not files_eth:
-        print("No files provided for BTCUSDT or ETHUSDT, exiting format_data")
-        return
-    
-    if data_provider == "binance":
-        files_btc = sorted([f for f in files_btc if "BTCUSDT" in os.path.basename(f) and f.endswith(".zip")])
-        files_eth = sorted([f for f in files_eth if "ETHUSDT" in os.path.basename(f) and f.endswith(".zip")])
-        print(f"Filtered BTCUSDT files: {files_btc[:5]}")
-        print(f"Filtered ETHUSDT files: {files_eth[:5]}")
-    elif data_provider == "coingecko":
-        files_btc = sorted([x for x in files_btc if x.endswith(".json")])
-        files_eth = sorted([x for x in files_eth if x.endswith(".json")])
-
-    if len(files_btc) == 0 or len(files_eth) == 0:
-        print("No valid files to process for BTCUSDT or ETHUSDT after filtering")
-        return
+def merge_pairs(frames):
+    """Join the per-pair frames (pair -> DataFrame) into one frame with `<column>_<pair>` columns."""
+    return pd.concat([df.rename(columns=lambda x: f"{x}_{pair}") for pair, df in frames.items()], axis=1)
 
-    price_df_btc = pd.DataFrame()
-    price_df_eth = pd.DataFrame()
+def format_days(parsed, days):
+    """Merge the cached days of every pair and build the training frame from them."""
+    from ingest import load_parsed_days
+    price_df = merge_pairs({pair: load_parsed_days([parsed[pair][day] for day in days]) for pair in PAIRS})
 
-    if data_provider == "binance":
-        for file in files_btc:
-            zip_file_path = os.path.join(binance_data_path, os.path.basename(file))
-            if not os.path.exists(zip_file_path):
-                print(f"File not found: {zip_file_path}")
-                continue
-            try:
-                myzip = ZipFile(zip_file_path)
-                with myzip.open(myzip.filelist[0]) as f:
-                    line = f.readline()
-                    header = 0 if line.decode("utf-8").startswith("open_time") else None
-                df = pd.read_csv(myzip.open(myzip.filelist[0]), header=header).iloc[:, :11]
-                df.columns = ["start_time", "open", "high", "low", "close", "volume", "end_time", "volume_usd", "n_trades", "taker_volume", "taker_volume_usd"]
-                max_time = df["end_time"].max()
-                print(f"Sample end_time values from {file}: {df['end_time'].head().tolist()}")
-                if max_time > 1e15:  # Nanoseconds
-                    df["date"] = pd.to_datetime(df["end_time"], unit="ns")
-                elif max_time > 1e12:  # Microseconds
-                    df["date"] = pd.to_datetime(df["end_time"], unit="us")
-                else:  # Milliseconds
-                    df["date"] = pd.to_datetime(df["end_time"], unit="ms")
-                df.set_index("date", inplace=True)
-                print(f"Processed {file} with {len(df)} rows")
-                price_df_btc = pd.concat([price_df_btc, df])
-            except Exception as e:
-                print(f"Error processing {file}: {str(e)}")
-                continue
-
-        for file in files_eth:
-            zip_file_path = os.path.join(binance_data_path, os.path.basename(file))
-            if not os.path.exists(zip_file_path):
-                print(f"File not found: {zip_file_path}")
-                continue
-            try:
-                myzip = ZipFile(zip_file_path)
-                with myzip.open(myzip.filelist[0]) as f:
-                    line = f.readline()
-                    header = 0 if line.decode("utf-8").startswith("open_time") else None
-                df = pd.read_csv(myzip.open(myzip.filelist[0]), header=header).iloc[:, :11]
-                df.columns = ["start_time", "open", "high", "low", "close", "volume", "end_time", "volume_usd", "n_trades", "taker_volume", "taker_volume_usd"]
-                max_time = df["end_time"].max()
-                print(f"Sample end_time values from {file}: {df['end_time'].head().tolist()}")
-                if max_time > 1e15:  # Nanoseconds
-                    df["date"] = pd.to_datetime(df["end_time"], unit="ns")
-                elif max_time > 1e12:  # Microseconds
-                    df["date"] = pd.to_datetime(df["end_time"], unit="us")
-                else:  # Milliseconds
-                    df["date"] = pd.to_datetime(df["end_time"], unit="ms")
-                df.set_index("date", inplace=True)
-                print(f"Processed {file} with {len(df)} rows")
-                price_df_eth = pd.concat([price_df_eth, df])
-            except Exception as e:
-                print(f"Error processing {file}: {str(e)}")
-                continue
-
-    if price_df_btc.empty or price_df_eth.empty:
-        print("No data processed for BTCUSDT or ETHUSDT")
-        return
+    # Feature engineering for volatility prediction; the features are shared by every topic
+    price_df = add_targets(build_features(price_df))
+    return price_df.dropna()
 
-    price_df_btc = price_df_btc.rename(columns=lambda x: f"{x}_BTCUSDT")
-    price_df_eth = price_df_eth.rename(columns=lambda x: f"{x}_ETHUSDT")
-    price_df = pd.concat([price_df_btc, price_df_eth], axis=1)
+def format_data(files, data_provider):
+    print(", ".join(f"New files for {pair}: {len(files[pair])}" for pair in PAIRS))
+    if data_provider != "binance":
+        print(f"No data processed for {', '.join(PAIRS)}")
+        return
 
-    # Feature engineering for volatility prediction
-    for pair in ["ETHUSDT", "BTCUSDT"]:
-        price_df[f"log_return_{pair}"] = np.log(price_df[f"close_{pair}"].shift(-1) / price_df[f"close_{pair}"])
-        price_df[f"volatility_6h_{pair}"] = price_df[f"log_return_{pair}"].rolling(window=360).std() * np.sqrt(360)
-        for metric in ["close", "volume", "log_return"]:
-            for lag in range(1, 11):
-                price_df[f"{metric}_{pair}_lag{lag}"] = price_df[f"{metric}_{pair}"].shift(lag)
-        price_df[f"volatility_6h_{pair}_lag1"] = price_df[f"volatility_6h_{pair}"].shift(1)
+    from ingest import update_parsed_days
+    # Only zips without an up-to-date per-day cache are parsed
+    parsed = update_parsed_days(PAIRS, binance_data_path)
+    days = [day for day in parsed[PAIRS[0]] if all(day in parsed[pair] for pair in PAIRS[1:])][-int(TRAINING_DAYS):]
+    if not days:
+        print(f"No data processed for {', '.join(PAIRS)}")
+        return
 
-    price_df["hour_of_day"] = price_df.index.hour
-    price_df["target_BTCUSDT"] = price_df["volatility_6h_BTCUSDT"]
+    last_timestamp = stored_last_timestamp() if TRAINING_DATA_FORMAT == "npy" else None
+    last_day = str(last_timestamp.date()) if last_timestamp is not None else None
+    if last_day in days:
+        new_days = [day for day in days if day > last_day]
+        if not new_days:
+            print("Training data is already up to date")
+            return
+        # Enough stored days to fill the lags and the longest rolling window of the first new row
+        history_days = -(-max([VOLATILITY_WINDOW] + [topic.window for topic in TOPICS]) // 1440)
+        stored_days = [day for day in days if day <= last_day][-history_days:]
+        price_df = format_days(parsed, stored_days + new_days)
+        price_df = price_df[price_df.index > last_timestamp]
+        print(f"Appending {len(price_df)} rows for {len(new_days)} new days")
+        append_training_data(price_df)
+        return
 
-    price_df = price_df.dropna()
+    price_df = format_days(parsed, days)
     print(f"Total rows in price_df after preprocessing: {len(price_df)}")
     print(f"First few dates in price_df: {price_df.index[:5].tolist()}")
 
-    price_df.to_csv(training_price_data_path, date_format='%Y-%m-%d %H:%M:%S')
-    print(f"Data saved to {training_price_data_path}")
+    write_training_data(price_df)
 
-def load_frame(file_path, timeframe):
-    print(f"Loading data from {file_path}...")
-    df = pd.read_csv(file_path, index_col='date', parse_dates=True)
-    df.ffill(inplace=True)
-    df.bfill(inplace=True)
-    
-    features = [
-        f"{metric}_{pair}_lag{lag}" 
-        for pair in ["ETHUSDT", "BTCUSDT"]
-        for metric in ["close", "volume", "log_return"]
-        for lag in range(1, 11)
-    ] + [f"volatility_6h_{pair}_lag1" for pair in ["ETHUSDT", "BTCUSDT"]] + ["hour_of_day"]
-    
-    missing_features = [f for f in features if f not in df.columns]
-    if missing_features:
-        raise ValueError(f"Missing features in data: {missing_features}")
-    
-    X = df[features]
-    y = df["target_BTCUSDT"]
+def load_frame(timeframe, data_format=TRAINING_DATA_FORMAT):
+    from sklearn.preprocessing import StandardScaler
+    X, y, index = read_training_data(data_format, days=TRAINING_DAYS)
     
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
     
     split_idx = int(len(X) * 0.8)
     X_train, X_test = X_scaled[:split_idx], X_scaled[split_idx:]
-    y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]  # Fixed syntax error
+    y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
     
-    print(f"Loaded {len(df)} rows, resampled to {timeframe}")
+    print(f"Loaded {len(index)} rows, resampled to {timeframe}")
     return X_train, X_test, y_train, y_test, scaler
 
-def preprocess_live_data(df_btc, df_eth):
-    if "date" in df_btc.columns:
-        df_btc.set_index("date", inplace=True)
-    if "date" in df_eth.columns:
-        df_eth.set_index("date", inplace=True)
-    
-    df_btc = df_btc.rename(columns=lambda x: f"{x}_BTCUSDT" if x != "date" else x)
-    df_eth = df_eth.rename(columns=lambda x: f"{x}_ETHUSDT" if x != "date" else x)
-    
-    df = pd.concat([df_btc, df_eth], axis=1)
-    print(f"Live data sample (raw):\n{df.tail()}")
-    
-    for pair in ["ETHUSDT", "BTCUSDT"]:
-        df[f"log_return_{pair}"] = np.log(df[f"close_{pair}"].shift(-1) / df[f"close_{pair}"])
-        df[f"volatility_6h_{pair}"] = df[f"log_return_{pair}"].rolling(window=360).std() * np.sqrt(360)
-        for metric in ["close", "volume", "log_return"]:
-            for lag in range(1, 11):
-                df[f"{metric}_{pair}_lag{lag}"] = df[f"{metric}_{pair}"].shift(lag)
-        df[f"volatility_6h_{pair}_lag1"] = df[f"volatility_6h_{pair}"].shift(1)
-
-    df["hour_of_day"] = df.index.hour
+def build_live_features(frames):
+    # The frames may be shared through the live data cache, so they are not modified in place
+    df = merge_pairs({
+        pair: frame.set_index("date") if "date" in frame.columns else frame
+        for pair, frame in frames.items()
+    })
+    if VERBOSE:
+        print(f"Live data sample (raw):\n{df.tail()}")
     
+    df = build_features(df)
     df = df.dropna()
-    print(f"Live data after preprocessing:\n{df.tail()}")
-    
-    features = [
-        f"{metric}_{pair}_lag{lag}" 
-        for pair in ["ETHUSDT", "BTCUSDT"]
-        for metric in ["close", "volume", "log_return"]
-        for lag in range(1, 11)
-    ] + [f"volatility_6h_{pair}_lag1" for pair in ["ETHUSDT", "BTCUSDT"]] + ["hour_of_day"]
-    
-    X = df[features]
-    
-    with open(scaler_file_path, "rb") as f:
-        scaler = pickle.load(f)
-    X_scaled = scaler.transform(X)
+    if VERBOSE:
+        print(f"Live data after preprocessing:\n{df.tail()}")
     
-    return X_scaled
+    return df[FEATURES]
 
-def train_model(timeframe, file_path=training_price_data_path):
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Training data file not found at {file_path}. Ensure data is downloaded and formatted.")
+def preprocess_live_data(frames, scaler):
+    with span("features"):
+        features = build_live_features(frames)
+    with span("transform"):
+        return scaler.transform(features)
+
+def tune_model(topic, estimator, param_grid, X_train, y_train, artifacts):
+    """Search `param_grid` and refit the best parameters on all training rows.
+
+    The best parameters of the topic's previous run of the same model are scored first.
+    The new best parameters and the per-candidate report are added to `artifacts`
+    so they are saved next to the model.
+    """
+    from sklearn.base import clone
+    from search import search
+    previous = load_json_artifact(BEST_PARAMS_FILE, registry_for(topic).current_dir())
+    warm_start_params = previous["params"] if previous and previous.get("model") == topic.model else None
+    best_params, report = search(
+        estimator,
+        param_grid,
+        X_train,
+        y_train,
+        strategy=SEARCH_STRATEGY,
+        budget_seconds=SEARCH_BUDGET_SECONDS,
+        warm_start_params=warm_start_params,
+    )
+    model = clone(estimator).set_params(**best_params)
+    model.fit(X_train, y_train)
+    artifacts[BEST_PARAMS_FILE] = {"model": topic.model, "params": best_params}
+    artifacts[SEARCH_REPORT_FILE] = {"strategy": SEARCH_STRATEGY, "budget_seconds": SEARCH_BUDGET_SECONDS, "candidates": report}
+    return model
+
+def train_model(timeframe, data_format=TRAINING_DATA_FORMAT):
+    if not training_data_exists(data_format) and not training_data_exists("csv"):
+        raise FileNotFoundError(f"Training data file not found at {training_data_path(data_format)}. Ensure data is downloaded and formatted.")
+    if TRAINING_MODE == "incremental":
+        return train_model_incremental(data_format)
+    if TRAINING_MODE != "full":
+        raise ValueError(f"Unsupported training mode: {TRAINING_MODE}")
     
-    X_train, X_test, y_train, y_test, scaler = load_frame(file_path, timeframe)
+    # The features and their scaler are shared, so the store is read and scaled once for all topics
+    X_train, X_test, y_train, y_test, scaler = load_frame(timeframe, data_format)
     print(f"Training data shape: {X_train.shape}, Test data shape: {X_test.shape}")
+    missing = [topic.target for topic in TOPICS if topic.target not in y_train.columns]
+    if missing:
+        raise ValueError(f"Training data has no {missing} targets, re-run format_data for the configured topics")
     
-    tscv = TimeSeriesSplit(n_splits=5)
-    if MODEL == "KNN":
-        print("\n🚀 Training kNN Model with Grid Search...")
+    models = {}
+    for topic in TOPICS:
+        models[topic.key] = train_topic(topic, X_train, X_test, y_train[topic.target], y_test[topic.target], scaler)
+    return models, scaler
+
+def update_moments(X, y, start, stop, generation):
+    """Moments of the rows `start:stop` of the store, moved along from the ones saved by the previous run.
+
+    Only rows appended since then are read, and rows that fell out of the window
+    are taken out, unless the store was rewritten or the columns changed, in which
+    case the window is read again. Returns (moments, first row added this run).
+    """
+    from incremental import Moments
+    columns = FEATURES + list(y.columns)
+    X, y = X.to_numpy(), y.to_numpy()
+    previous, meta = None, None
+    if os.path.exists(moments_path):
+        try:
+            previous, meta = Moments.load(moments_path)
+        except Exception as e:
+            print(f"Could not load the saved moments, recomputing them: {str(e)}")
+    if (previous is not None and previous.columns == columns and meta["generation"] == generation
+            and meta["start"] <= start and meta["stop"] <= stop and start <= meta["stop"]):
+        print(f"Folding {stop - meta['stop']} new rows into the moments, dropping {start - meta['start']} expired rows")
+        moments = previous.fold(X, y, meta["stop"], stop, TRAINING_CHUNK_ROWS)
+        moments.fold(X, y, meta["start"], start, TRAINING_CHUNK_ROWS, sign=-1)
+        added_from = meta["stop"]
+    else:
+        print(f"Computing the moments of {stop - start} rows, {TRAINING_CHUNK_ROWS} at a time")
+        moments = Moments(columns).fold(X, y, start, stop, TRAINING_CHUNK_ROWS)
+        added_from = None
+    moments.save(moments_path, generation=generation, start=start, stop=stop)
+    return moments, added_from
+
+def evaluate_new_rows(topic, X, y):
+    """Print the errors of the topic's served model on rows it was not trained on, `TRAINING_CHUNK_ROWS` at a time."""
+    if len(X) == 0 or not registry_for(topic).has_artifact():
+        return
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    loaded_model, scaler = registry_for(topic).get()
+    predictions = np.concatenate([
+        loaded_model.predict(scaler.transform(X.iloc[start:start + TRAINING_CHUNK_ROWS]))
+        for start in range(0, len(X), TRAINING_CHUNK_ROWS)
+    ])
+    print(f"Test MAE on {len(X)} new rows: {mean_absolute_error(y, predictions):.6f}")
+    print(f"Test RMSE on {len(X)} new rows: {np.sqrt(mean_squared_error(y, predictions)):.6f}")
+    print(f"Test R² on {len(X)} new rows: {r2_score(y, predictions):.6f}")
+
+def train_model_incremental(data_format=TRAINING_DATA_FORMAT):
+    """Train the linear topics from running moments of the memory-mapped store.
+
+    Peak memory is one chunk of TRAINING_CHUNK_ROWS rows, however long the
+    window. Each run reads only the rows appended since the previous one, and
+    every model is fitted on the whole window; the new rows are scored with the
+    previously served model before they are folded in.
+    """
+    from incremental import INCREMENTAL_MODELS, fit_incremental, fit_scaler, training_scores
+    from predictors import export_predictor
+    if data_format != "npy":
+        raise ValueError("TRAINING_MODE=incremental needs TRAINING_DATA_FORMAT=npy")
+    unsupported = [topic.key for topic in TOPICS if topic.model not in INCREMENTAL_MODELS]
+    if unsupported:
+        raise ValueError(f"Topics {unsupported} cannot be trained incrementally, use one of {INCREMENTAL_MODELS} or TRAINING_MODE=full")
+    X, y, index = read_training_data(data_format)
+    missing = [topic.target for topic in TOPICS if topic.target not in y.columns]
+    if missing:
+        raise ValueError(f"Training data has no {missing} targets, re-run format_data for the configured topics")
+
+    start, stop = window_start(index, TRAINING_DAYS), len(index)
+    with span("moments"):
+        moments, added_from = update_moments(X, y, start, stop, read_manifest()["generation"])
+    print(f"Training on {moments.count} rows")
+    scaler = fit_scaler(moments, len(FEATURES))
+
+    models = {}
+    for topic in TOPICS:
+        print(f"\n📈 Topic {topic.key}: {topic.horizon} volatility of {topic.pair}")
+        if added_from is not None:
+            evaluate_new_rows(topic, X.iloc[added_from:stop], y[topic.target].iloc[added_from:stop])
+        target = moments.columns.index(topic.target)
+        model = fit_incremental(topic.model, moments, len(FEATURES), target)
+        rmse, r2 = training_scores(model, moments, len(FEATURES), target)
+        print(f"\n✅ Trained {topic.model} model from moments")
+        print(f"Training RMSE: {rmse:.6f}")
+        print(f"Training R²: {r2:.6f}")
+        artifact_dir = save_artifacts({MODEL_FILE: model, SCALER_FILE: scaler, **export_predictor(model, scaler)}, topic_root(topic))
+        print(f"Trained model and scaler saved to {artifact_dir}")
+        registry_for(topic).publish(model, scaler)
+        models[topic.key] = model
+    return models, scaler
+
+def kernel_estimator(exact, approximate):
+    """The exact kernel estimator, or its approximation selected by KERNEL_APPROXIMATION."""
+    from kernel_approx import KERNEL_APPROXIMATIONS
+    if KERNEL_APPROXIMATION not in KERNEL_APPROXIMATIONS:
+        raise ValueError(f"Unsupported kernel approximation: {KERNEL_APPROXIMATION}")
+    if KERNEL_APPROXIMATION == "none":
+        return exact
+    print(f"Approximating the kernel with {KERNEL_APPROXIMATION}, rank {KERNEL_RANK}")
+    return approximate(method=KERNEL_APPROXIMATION, n_components=KERNEL_RANK)
+
+def train_topic(topic, X_train, X_test, y_train, y_test, scaler):
+    """Fit, evaluate and publish the model of one topic."""
+    from sklearn.neighbors import KNeighborsRegressor
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from sklearn.linear_model import LinearRegression, BayesianRidge
+    from sklearn.svm import SVR
+    from sklearn.kernel_ridge import KernelRidge
+    from knn_index import INDEX_KINDS, KNNIndex
+    from kernel_approx import ApproximateKernelRidge, ApproximateSVR
+    from predictors import export_predictor
+    print(f"\n📈 Topic {topic.key}: {topic.horizon} volatility of {topic.pair}")
+    artifacts = {}
+    if topic.model == "KNN":
+        print(f"\n🚀 Training kNN Model with {SEARCH_STRATEGY} search...")
         param_grid = {
             "n_neighbors": [25, 50, 100, 200],  # Adjusted range
             "weights": ["uniform", "distance"],
             "metric": ["minkowski", "manhattan"]
         }
-        model = KNeighborsRegressor()
-        grid_search = GridSearchCV(
-            model,
-            param_grid,
-            cv=tscv,
-            scoring=make_scorer(mean_absolute_error, greater_is_better=False),
-            n_jobs=-1,
-            verbose=2
-        )
-        grid_search.fit(X_train, y_train)
-        model = grid_search.best_estimator_
+        model = tune_model(topic, KNeighborsRegressor(), param_grid, X_train, y_train, artifacts)
         print(f"\n✅ Best k: {model.n_neighbors}, Metric: {model.metric}, Weighting: {model.weights}")
-    elif MODEL == "LinearRegression":
+    elif topic.model == "LinearRegression":
         model = LinearRegression()
         model.fit(X_train, y_train)
         print("\n✅ Trained LinearRegression model")
-    elif MODEL == "SVR":
-        print("\n🚀 Training SVR Model with Grid Search...")
+    elif topic.model == "SVR":
+        print(f"\n🚀 Training SVR Model with {SEARCH_STRATEGY} search...")
         param_grid = {
             "C": [0.1, 1, 10],
             "epsilon": [0.01, 0.1, 1],
             "kernel": ["rbf", "linear"]
         }
-        model = SVR()
-        grid_search = GridSearchCV(
-            model,
-            param_grid,
-            cv=tscv,
-            scoring=make_scorer(mean_absolute_error, greater_is_better=False),
-            n_jobs=-1,
-            verbose=2
-        )
-        grid_search.fit(X_train, y_train)
-        model = grid_search.best_estimator_
+        model = tune_model(topic, kernel_estimator(SVR(), ApproximateSVR), param_grid, X_train, y_train, artifacts)
         print(f"\n✅ Best C: {model.C}, Epsilon: {model.epsilon}, Kernel: {model.kernel}")
-    elif MODEL == "KernelRidge":
-        model = KernelRidge()
+    elif topic.model == "KernelRidge":
+        model = kernel_estimator(KernelRidge(), ApproximateKernelRidge)
         model.fit(X_train, y_train)
         print("\n✅ Trained KernelRidge model")
-    elif MODEL == "BayesianRidge":
+    elif topic.model == "BayesianRidge":
         model = BayesianRidge()
         model.fit(X_train, y_train)
         print("\n✅ Trained BayesianRidge model")
     else:
-        raise ValueError(f"Unsupported model: {MODEL}")
+        raise ValueError(f"Unsupported model: {topic.model}")
     
     train_pred = model.predict(X_train)
     train_mae = mean_absolute_error(y_train, train_pred)
@@ -290,29 +335,120 @@ def train_model(timeframe, file_path=training_price_data_path):
     print(f"Test RMSE: {rmse:.6f}")
     print(f"Test R²: {r2:.6f}")
     
-    os.makedirs(os.path.dirname(model_file_path), exist_ok=True)
-    with open(model_file_path, "wb") as f:
-        pickle.dump(model, f)
-    with open(scaler_file_path, "wb") as f:
-        pickle.dump(scaler, f)
-    print(f"Trained model saved to {model_file_path}")
-    print(f"Scaler saved to {scaler_file_path}")
-    
-    return model, scaler
+    serving_model = model
+    if topic.model == "KNN" and KNN_INDEX != "none":
+        print("\n🚀 Building KNN serving index...")
+        kinds = tuple(INDEX_KINDS) + ("brute",) if KNN_INDEX == "auto" else (KNN_INDEX,)
+        serving_model = KNNIndex.from_regressor(model, X_train, y_train, X_test[-200:], kinds=kinds)
+        index_diff = np.abs(serving_model.predict(X_test) - predictions).max()
+        print(f"KNN index max prediction difference on test data: {index_diff:.3e}")
 
-def get_inference(token, timeframe, region, data_provider):
-    with open(model_file_path, "rb") as f:
-        loaded_model = pickle.load(f)
+    # The serving model is also saved as arrays that load without unpickling, see predictors.py
+    artifacts.update(export_predictor(serving_model, scaler))
+    artifact_dir = save_artifacts({MODEL_FILE: model, SCALER_FILE: scaler, **artifacts}, topic_root(topic))
+    print(f"Trained model and scaler saved to {artifact_dir}")
+    registry_for(topic).publish(serving_model, scaler)
     
+    return model
+
+def fetch_live_data(region, data_provider):
+    """Fetch the live frames of every pair in parallel, going through the shared live data cache.
+
+    Returns pair -> frame. Pairs are fetched once for all the topics that use them. The
+    frames are shared with other requests through the cache, so they are read-only.
+    """
+    with span("fetch"):
+        return _fetch_live_data(region, data_provider)
+
+def _fetch_live_data(region, data_provider):
     if data_provider == "coingecko":
-        df_btc = download_coingecko_current_day_data("BTC", CG_API_KEY)
-        df_eth = download_coingecko_current_day_data("ETH", CG_API_KEY)
+        jobs = {
+            pair: (lambda token=pair.removesuffix("USDT"): live_data_cache.get(
+                ("coingecko", token, None),
+                lambda: download_coingecko_current_day_data(token, CG_API_KEY, timeout=LIVE_FETCH_TIMEOUT)))
+            for pair in PAIRS
+        }
     else:
-        df_btc = download_binance_current_day_data("BTCUSDT", region)
-        df_eth = download_binance_current_day_data("ETHUSDT", region)
+        if LIVE_DATA_SOURCE == "stream":
+            try:
+                market_stream.ensure_started()
+                return market_stream.frames()
+            except StreamNotReady as e:
+                print(f"Live stream not ready, fetching over REST: {str(e)}")
+        jobs = {
+            pair: (lambda pair=pair: live_data_cache.get(
+                ("binance", pair, region),
+                lambda: download_binance_current_day_data(pair, region, timeout=LIVE_FETCH_TIMEOUT)))
+            for pair in PAIRS
+        }
+    return fetch_concurrently(jobs, LIVE_FETCH_DEADLINE)
+
+def compute_inference(region, data_provider, topics=TOPICS, required=None):
+    """Predict every topic from the newest closed candle; returns ({topic key: prediction}, candle timestamp).
+
+    The live fetch and the feature vector are shared; each topic only adds a scale and a predict.
+    A topic that is not trained yet or fails to predict is left out of the result, so it cannot
+    fail the others; only the error of the `required` topic is raised.
+    """
+    frames = fetch_live_data(region, data_provider)
+    with span("features"):
+        latest = feature_engine.ingest(frames)
     
-    X_new = preprocess_live_data(df_btc, df_eth)
-    print("Inference input data shape:", X_new.shape)
-    volatility_pred = loaded_model.predict(X_new)[0]
-    print(f"Predicted 6h BTC/USD Volatility: {volatility_pred:.6f}")
-    return volatility_pred
+    predictions = {}
+    for topic in topics:
+        try:
+            loaded_model, scaler = registry_for(topic).get()
+            with span("transform"):
+                X_new = scaler.transform(latest)
+            with span("predict"):
+                predictions[topic.key] = loaded_model.predict(X_new)[0]
+        except Exception as e:
+            if topic == required:
+                raise
+            print(f"No prediction for {topic.key}: {e}")
+            continue
+        print(f"Predicted {topic.horizon} {topic.token}/USD Volatility: {predictions[topic.key]:.6f}")
+    return predictions, latest.index[0]
+
+def get_inference(token, timeframe, region, data_provider, horizon=None):
+    topic = find_topic(token, horizon)
+    if topic is None:
+        raise ValueError(f"No topic serves {token} {horizon or ''}".rstrip())
+    return compute_inference(region, data_provider, [topic], required=topic)[0][topic.key]
+
+def get_batch_inference(timeframe, region, data_provider, last=None, timestamps=None, topic=TOPICS[0]):
+    """Predict every requested closed candle from one live fetch, one feature build and one predict call.
+
+    Rows are chosen either as the `last` N closed candles or by candle `timestamps`
+    (ISO strings or epoch milliseconds). Returns (timestamps, predictions).
+    """
+    if (last is None) == (timestamps is None):
+        raise ValueError("Exactly one of 'last' or 'timestamps' is required")
+    loaded_model, scaler = registry_for(topic).get()
+
+    frames = fetch_live_data(region, data_provider)
+    with span("features"):
+        features = build_live_features(frames)
+
+    if last is not None:
+        if not isinstance(last, int) or last < 1:
+            raise ValueError("'last' must be a positive integer")
+        features = features.iloc[-last:]
+    else:
+        if not isinstance(timestamps, list) or not timestamps:
+            raise ValueError("'timestamps' must be a non-empty list")
+        requested = pd.DatetimeIndex([
+            pd.to_datetime(ts, unit="ms" if isinstance(ts, (int, float)) else None, utc=True).tz_localize(None)
+            for ts in timestamps
+        ])
+        missing = requested.difference(features.index)
+        if len(missing):
+            raise LookupError(f"No live features for {len(missing)} timestamps, e.g. {missing[0].isoformat()}; available {features.index[0].isoformat()} to {features.index[-1].isoformat()}")
+        features = features.loc[requested]
+
+    with span("transform"):
+        X_new = scaler.transform(features)
+    with span("predict"):
+        predictions = loaded_model.predict(X_new)
+    print(f"Predicted {topic.horizon} {topic.token}/USD Volatility for {len(predictions)} rows")
+    return features.index, predictions
@@ -0,0 +1,197 @@
+"""Serving artifacts as plain arrays with a JSON manifest, and the NumPy predictors they load into.
+
+`export_predictor` turns the serving model and scaler of a training run into
+files for `registry.save_artifacts`: ``predictor.json`` names the predictor
+kind and its scalar parameters, and every array is a ``predictor.<name>.npy``
+file next to it. `load_predictor` memory-maps the arrays with
+``allow_pickle=False``, so loading a version executes nothing from the files
+and imports no estimator module; only a KNN tree imports ``sklearn.neighbors``
+to restore itself from its saved node arrays. Models without an export here
+are served from their pickles as before.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+PREDICTOR_FILE = "predictor.json"
+
+
+def _array_file(name):
+    return f"predictor.{name}.npy"
+
+
+class Standardizer:
+    """`StandardScaler.transform` from the stored mean and scale."""
+
+    def __init__(self, mean, scale, feature_names=None):
+        self.mean = mean
+        self.scale = scale
+        self.feature_names = feature_names
+
+    def transform(self, X):
+        if self.feature_names is not None and hasattr(X, "columns") and list(X.columns) != self.feature_names:
+            raise ValueError("Features do not match the ones the scaler was fitted on")
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+
+class LinearPredictor:
+    """Linear models, and the linear kernel of SVR and KernelRidge folded into one coefficient vector."""
+
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+class RBFPredictor:
+    """Weighted rbf kernels against stored rows: exact rbf SVR and KernelRidge, and Nystroem approximations."""
+
+    def __init__(self, centers, weights, gamma, intercept):
+        self.centers = centers
+        self.weights = weights
+        self.gamma = gamma
+        self.intercept = intercept
+        self.center_norms = (centers ** 2).sum(axis=1)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ self.centers.T + self.center_norms[None, :]
+        return np.exp(-self.gamma * np.maximum(distances, 0)) @ self.weights + self.intercept
+
+
+class FourierPredictor:
+    """Linear model on random Fourier features, see kernel_approx.py."""
+
+    def __init__(self, random_weights, random_offset, coef, intercept):
+        self.random_weights = random_weights
+        self.random_offset = random_offset
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict(self, X):
+        features = np.cos(np.asarray(X, dtype=np.float64) @ self.random_weights + self.random_offset)
+        return features * np.sqrt(2.0 / len(self.coef)) @ self.coef + self.intercept
+
+
+def _knn_parts(params, X, y, tree):
+    arrays = {"X": X, "y": y}
+    if tree is not None:
+        from knn_index import tree_state
+        tree_arrays, tree_params = tree_state(tree)
+        arrays.update({f"tree_{name}": values for name, values in tree_arrays.items()})
+        params = {**params, "tree": tree_params}
+    return "knn", params, arrays
+
+
+def _intercept(value):
+    return float(np.ravel(value)[0]) if np.ndim(value) else float(value)
+
+
+def _model_parts(model):
+    """(kind, scalar params, arrays) of a fitted serving model, or None if it has no array form."""
+    # Imported here: only training exports, serving never needs these modules
+    from sklearn.kernel_approximation import Nystroem, RBFSampler
+    from sklearn.kernel_ridge import KernelRidge
+    from sklearn.linear_model import BayesianRidge, LinearRegression
+    from sklearn.neighbors import KNeighborsRegressor
+    from sklearn.svm import SVR
+    from kernel_approx import ApproximateKernelRidge, ApproximateSVR
+    from knn_index import KNNIndex
+
+    if isinstance(model, (LinearRegression, BayesianRidge)):
+        return "linear", {"intercept": _intercept(model.intercept_)}, {"coef": np.ravel(model.coef_)}
+    if isinstance(model, SVR) and model.kernel in ("linear", "rbf"):
+        params = {"intercept": _intercept(model.intercept_)}
+        if model.kernel == "linear":
+            return "linear", params, {"coef": np.ravel(model.dual_coef_ @ model.support_vectors_)}
+        return "rbf", {**params, "gamma": float(model._gamma)}, {"centers": model.support_vectors_, "weights": np.ravel(model.dual_coef_)}
+    if isinstance(model, KernelRidge) and model.kernel in ("linear", "rbf"):
+        if model.kernel == "linear":
+            return "linear", {"intercept": 0.0}, {"coef": np.ravel(model.X_fit_.T @ model.dual_coef_)}
+        gamma = model.gamma if model.gamma is not None else 1.0 / model.X_fit_.shape[1]
+        return "rbf", {"intercept": 0.0, "gamma": float(gamma)}, {"centers": model.X_fit_, "weights": np.ravel(model.dual_coef_)}
+    if isinstance(model, (ApproximateKernelRidge, ApproximateSVR)):
+        feature_map = model.feature_map_
+        params = {"intercept": model.intercept_}
+        if feature_map is None:
+            return "linear", params, {"coef": model.coef_}
+        if isinstance(feature_map, RBFSampler):
+            return "fourier", params, {"random_weights": feature_map.random_weights_, "random_offset": feature_map.random_offset_, "coef": model.coef_}
+        if isinstance(feature_map, Nystroem) and feature_map.kernel == "rbf":
+            gamma = feature_map.gamma if feature_map.gamma is not None else 1.0 / feature_map.components_.shape[1]
+            return "rbf", {**params, "gamma": float(gamma)}, {"centers": feature_map.components_, "weights": model.coef_}
+        return None
+    if isinstance(model, KNNIndex):
+        return _knn_parts({
+            "n_neighbors": model.n_neighbors, "weights": model.weights, "kind": model.kind, "leaf_size": model.leaf_size,
+            "metric": model.metric, "metric_params": model.metric_params,
+        }, np.asarray(model.index.data), model.y, model.index if model.kind != "brute" else None)
+    if isinstance(model, KNeighborsRegressor) and model.weights in ("uniform", "distance"):
+        return _knn_parts({
+            "n_neighbors": model.n_neighbors, "weights": model.weights, "kind": model._fit_method, "leaf_size": model.leaf_size,
+            "metric": model.effective_metric_, "metric_params": dict(model.effective_metric_params_),
+        }, model._fit_X, np.ravel(model._y), model._tree if model._fit_method != "brute" else None)
+    return None
+
+
+def export_predictor(model, scaler):
+    """Files (name -> JSON manifest or array) that `load_predictor` serves `model` and `scaler` from.
+
+    Returns an empty dict for models or scalers without an array form.
+    """
+    parts = _model_parts(model)
+    if parts is None or type(scaler).__name__ != "StandardScaler":
+        print(f"No array export for {type(model).__name__}, it is served from its pickle")
+        return {}
+    kind, params, arrays = parts
+    n_features = scaler.n_features_in_
+    arrays = {
+        # Integer and structured arrays (the KNN tree nodes) keep their dtype
+        **{name: np.ascontiguousarray(values, dtype=np.float64 if np.asarray(values).dtype.kind == "f" else None) for name, values in arrays.items()},
+        "scaler_mean": np.asarray(scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features), dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_ if scaler.scale_ is not None else np.ones(n_features), dtype=np.float64),
+    }
+    feature_names = getattr(scaler, "feature_names_in_", None)
+    manifest = {
+        "kind": kind,
+        "model": type(model).__name__,
+        "params": params,
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "arrays": sorted(arrays),
+    }
+    # The version id of the artifact, so the registry does not hash the arrays on every load
+    digest = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode())
+    for name in manifest["arrays"]:
+        digest.update(arrays[name].tobytes())
+    manifest["digest"] = digest.hexdigest()
+    return {PREDICTOR_FILE: manifest, **{_array_file(name): values for name, values in arrays.items()}}
+
+
+def read_predictor_manifest(directory):
+    with open(os.path.join(directory, PREDICTOR_FILE)) as f:
+        return json.load(f)
+
+
+def load_predictor(directory):
+    """Return (model, scaler, manifest) of the predictor exported to `directory`."""
+    manifest = read_predictor_manifest(directory)
+    arrays = {name: np.load(os.path.join(directory, _array_file(name)), mmap_mode="r", allow_pickle=False) for name in manifest["arrays"]}
+    params = manifest["params"]
+    kind = manifest["kind"]
+    if kind == "linear":
+        model = LinearPredictor(arrays["coef"], params["intercept"])
+    elif kind == "rbf":
+        model = RBFPredictor(arrays["centers"], arrays["weights"], params["gamma"], params["intercept"])
+    elif kind == "fourier":
+        model = FourierPredictor(arrays["random_weights"], arrays["random_offset"], arrays["coef"], params["intercept"])
+    elif kind == "knn":
+        from knn_index import KNNIndex
+        tree_arrays = {name[len("tree_"):]: values for name, values in arrays.items() if name.startswith("tree_")}
+        model = KNNIndex.from_arrays(arrays["X"], arrays["y"], params["n_neighbors"], params["weights"], params["kind"],
+                                     params["leaf_size"], params["metric"], params["metric_params"], tree_arrays, params.get("tree"))
+    else:
+        raise ValueError(f"Unsupported predictor kind: {kind}")
+    return model, Standardizer(arrays["scaler_mean"], arrays["scaler_scale"], manifest["feature_names"]), manifest
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+import numpy as np
+from config import model_file_path, scaler_file_path, models_path, MODEL
+from topics import TOPICS, Topic
+from predictors import PREDICTOR_FILE, load_predictor, read_predictor_manifest
+
+Artifact = namedtuple("Artifact", ["model", "scaler", "version", "directory", "stamp", "loaded_at", "load_seconds"])
+
+MODEL_FILE = "model.pkl"
+SCALER_FILE = "scaler.pkl"
+# Served instead of model.pkl by versions saved before predictor.json, see knn_index.py
+KNN_INDEX_FILE = "knn_index.pkl"
+BEST_PARAMS_FILE = "best_params.json"
+SEARCH_REPORT_FILE = "search_report.json"
+KEEP_VERSIONS = 3
+VERSION_PATTERN = re.compile(r"^\d{8}T\d{6}Z-[0-9a-f]{6}$")
+
+
+def save_artifacts(objects, root=models_path):
+    """Write `objects` (file name -> object) to a new version directory and make it current.
+
+    Names ending in `.json` are written as JSON, `.npy` arrays with `np.save`
+    (without pickles), everything else is pickled.
+    Files are written to a temporary directory that is renamed into place, then
+    the `current` pointer is swapped with an atomic rename, so readers see either
+    the previous complete version or the new one, never a half-written pickle.
+    Returns the new version directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:6]}"
+    tmp_dir = os.path.join(root, f".{name}.tmp")
+    os.makedirs(tmp_dir)
+    for file_name, obj in objects.items():
+        with open(os.path.join(tmp_dir, file_name), "wb") as f:
+            if file_name.endswith(".json"):
+                f.write(json.dumps(obj, indent=2, default=str).encode())
+            elif file_name.endswith(".npy"):
+                np.save(f, obj, allow_pickle=False)
+            else:
+                pickle.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+    version_dir = os.path.join(root, name)
+    os.rename(tmp_dir, version_dir)
+
+    pointer_path = os.path.join(root, "current")
+    with open(f"{pointer_path}.tmp", "w") as f:
+        f.write(name)
+    os.replace(f"{pointer_path}.tmp", pointer_path)
+    _prune_versions(root, name)
+    return version_dir
+
+
+def _prune_versions(root, current):
+    # Only version directories are pruned; the models root also holds the per-topic roots
+    versions = sorted(
+        entry for entry in os.listdir(root)
+        if VERSION_PATTERN.match(entry) and os.path.isdir(os.path.join(root, entry))
+    )
+    for entry in versions[:-KEEP_VERSIONS]:
+        if entry != current:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+def current_artifact_dir(root=models_path):
+    """Return the directory of the current artifact version, or None before the first versioned save."""
+    try:
+        with open(os.path.join(root, "current")) as f:
+            return os.path.join(root, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def load_json_artifact(file_name, directory):
+    """Read a JSON file saved in an artifact `directory`, or None if there is none."""
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, file_name)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class ModelRegistry:
+    """Process-wide cache of the serving model and scaler.
+
+    The artifacts are unpickled once and kept in memory. Each lookup stats the
+    `current` version pointer and reloads when it changes, so a retrain done by
+    a background job or by another worker is picked up without a restart. The
+    loaded pair is swapped in as a single tuple so readers never see a model from
+    one version with the scaler of another. A version with a `predictor.json`
+    (see predictors.py) serves its memory-mapped arrays without unpickling
+    anything; older versions and models without an array export are unpickled.
+    Before the first versioned save the legacy `model.pkl`/`scaler.pkl` in the
+    data directory are served. A pickled version with a prebuilt KNN index
+    serves the index in place of the pickled model.
+
+    `legacy_root` is a versioned root written before artifacts were kept per
+    topic; it is served until the first save under `root`.
+    """
+
+    def __init__(self, root, legacy_model_path=None, legacy_scaler_path=None, legacy_root=None):
+        self.root = root
+        self.legacy_model_path = legacy_model_path
+        self.legacy_scaler_path = legacy_scaler_path
+        self.legacy_root = legacy_root
+        self._lock = threading.Lock()
+        self._current = None
+
+    def _pointer_root(self):
+        for root in (self.root, self.legacy_root):
+            if root is not None and os.path.exists(os.path.join(root, "current")):
+                return root
+        return None
+
+    def current_dir(self):
+        """Directory of the served version, or None while legacy files (or nothing) are served."""
+        root = self._pointer_root()
+        return current_artifact_dir(root) if root is not None else None
+
+    def has_artifact(self):
+        """Whether there is anything to serve: a saved version or the legacy files."""
+        if self._pointer_root() is not None:
+            return True
+        return self.legacy_model_path is not None and os.path.exists(self.legacy_model_path) and os.path.exists(self.legacy_scaler_path)
+
+    def _stamp(self):
+        root = self._pointer_root()
+        if root is not None:
+            stat = os.stat(os.path.join(root, "current"))
+            return ("current", root, stat.st_ino, stat.st_mtime_ns)
+        if self.legacy_model_path is None:
+            raise FileNotFoundError(f"No model artifact saved under {self.root}, train the model first")
+        return ("legacy",) + tuple(os.stat(path).st_mtime_ns for path in (self.legacy_model_path, self.legacy_scaler_path))
+
+    def _paths(self):
+        """(version directory, model path, scaler path); the scaler path is None for an array predictor."""
+        directory = self.current_dir()
+        if directory is None:
+            return None, self.legacy_model_path, self.legacy_scaler_path
+        if os.path.exists(os.path.join(directory, PREDICTOR_FILE)):
+            return directory, os.path.join(directory, PREDICTOR_FILE), None
+        model_path = os.path.join(directory, KNN_INDEX_FILE)
+        if not os.path.exists(model_path):
+            model_path = os.path.join(directory, MODEL_FILE)
+        return directory, model_path, os.path.join(directory, SCALER_FILE)
+
+    def _read(self, paths):
+        blobs = []
+        for path in paths:
+            with open(path, "rb") as f:
+                blobs.append(f.read())
+        digest = hashlib.sha256()
+        for blob in blobs:
+            digest.update(blob)
+        return blobs, digest.hexdigest()[:16]
+
+    def _load(self, stamp):
+        start = time.perf_counter()
+        directory, model_path, scaler_path = self._paths()
+        if scaler_path is None:
+            model, scaler, manifest = load_predictor(directory)
+            version = manifest["digest"][:16]
+        else:
+            (model_blob, scaler_blob), version = self._read([model_path, scaler_path])
+            model = pickle.loads(model_blob)
+            scaler = pickle.loads(scaler_blob)
+        load_seconds = time.perf_counter() - start
+        print(f"Loaded model artifact {version} in {load_seconds:.3f}s")
+        return Artifact(model, scaler, version, directory, stamp, datetime.now(timezone.utc), load_seconds)
+
+    def get(self):
+        """Return the current (model, scaler), reloading them if a new version was saved."""
+        stamp = self._stamp()
+        current = self._current
+        if current is None or current.stamp != stamp:
+            with self._lock:
+                current = self._current
+                if current is None or current.stamp != stamp:
+                    current = self._load(stamp)
+                    self._current = current
+        return current.model, current.scaler
+
+    def publish(self, model, scaler):
+        """Swap in freshly trained objects that were just saved with `save_artifacts`."""
+        start = time.perf_counter()
+        with self._lock:
+            stamp = self._stamp()
+            directory, model_path, scaler_path = self._paths()
+            if scaler_path is None:
+                version = read_predictor_manifest(directory)["digest"][:16]
+            else:
+                _, version = self._read([model_path, scaler_path])
+            self._current = Artifact(model, scaler, version, directory, stamp, datetime.now(timezone.utc), time.perf_counter() - start)
+        print(f"Published model artifact {version}")
+
+    def info(self):
+        current = self._current
+        if current is None:
+            return {"loaded": False, "pid": os.getpid()}
+        return {
+            "loaded": True,
+            "pid": os.getpid(),
+            "version": current.version,
+            "directory": current.directory,
+            "model": type(current.model).__name__,
+            "loaded_at": current.loaded_at.isoformat(),
+            "load_seconds": round(current.load_seconds, 6),
+        }
+
+
+def topic_root(topic):
+    return os.path.join(models_path, topic.key)
+
+
+# Artifacts from before topics were served for the original BTC volatility model
+LEGACY_TOPIC = Topic("BTC", "6h", MODEL)
+model_registries = {
+    topic.key: ModelRegistry(topic_root(topic), model_file_path, scaler_file_path, models_path)
+    if topic == LEGACY_TOPIC else ModelRegistry(topic_root(topic))
+    for topic in TOPICS
+}
+# The registry of the first topic, served when a request does not name one
+model_registry = model_registries[TOPICS[0].key]
+
+
+def registry_for(topic):
+    return model_registries[topic.key]
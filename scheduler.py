@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from config import PRECOMPUTE_DELAY_SECONDS, PRECOMPUTE_MAX_AGE
+
+Prediction = namedtuple("Prediction", ["value", "as_of", "computed_at"])
+
+
+class PrecomputeScheduler:
+    """Computes the forecast once per candle close and keeps it in memory.
+
+    A daemon thread wakes `delay` seconds after every 1m candle close (giving the
+    exchange time to publish the closed candle), runs `compute` and publishes its
+    (value, as_of) as a single tuple, so readers never see a value with another
+    run's timestamp. `latest` only returns a prediction younger than `max_age`
+    seconds; callers fall back to computing synchronously otherwise.
+
+    The thread belongs to the process that started it. `ensure_started` is cheap
+    and restarts it in a forked worker, where threads of the parent do not exist.
+    """
+
+    def __init__(self, compute, candle_seconds=60, delay=PRECOMPUTE_DELAY_SECONDS, max_age=PRECOMPUTE_MAX_AGE):
+        self.compute = compute
+        self.candle_seconds = candle_seconds
+        self.delay = delay
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._current = None
+        self.runs = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.last_error = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._current = None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="precompute", daemon=True)
+            self._thread.start()
+
+    def _next_run(self, now):
+        return (int(now // self.candle_seconds) + 1) * self.candle_seconds + self.delay
+
+    def _run(self):
+        while True:
+            self.run_once()
+            time.sleep(max(0.0, self._next_run(time.time()) - time.time()))
+
+    def run_once(self):
+        start = time.perf_counter()
+        try:
+            value, as_of = self.compute()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Precompute failed: {str(e)}")
+            return
+        self.publish(value, as_of)
+        self.runs += 1
+        print(f"Precomputed prediction as of {as_of} in {time.perf_counter() - start:.3f}s")
+
+    def publish(self, value, as_of):
+        self._current = Prediction(value, as_of, time.time())
+
+    def latest(self):
+        """Return the precomputed Prediction, or None if there is none fresh enough to serve."""
+        current = self._current
+        if current is None or time.time() - current.computed_at > self.max_age:
+            self.fallbacks += 1
+            return None
+        return current
+
+    def stats(self):
+        current = self._current
+        stats = {
+            "running": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "last_error": self.last_error,
+        }
+        if current is not None:
+            stats.update({
+                "as_of": str(current.as_of),
+                "computed_at": datetime.fromtimestamp(current.computed_at, timezone.utc).isoformat(),
+                "age_seconds": round(time.time() - current.computed_at, 3),
+            })
+        return stats
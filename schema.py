@@ -0,0 +1,66 @@
+"""Typed column layout of the OHLCV frames shared by the data paths.
+
+Binance klines and CoinGecko OHLC arrive as JSON arrays of strings and
+numbers. They are converted here, a whole column at a time, into frames with
+fixed dtypes: float64 for prices and volumes, int64 for times and counts,
+and a datetime64 `date` column. No object columns are left. Historical zips
+use the same `KLINE_DTYPES` (see ingest.py).
+
+FEATURE_DTYPE selects the dtype of the feature matrix stored for training
+(float64 or float32). Prices themselves always stay float64, because log
+returns of float32 prices lose most of their precision.
+"""
+import numpy as np
+import pandas as pd
+from config import FEATURE_DTYPE as FEATURE_DTYPE_NAME
+
+KLINE_COLUMNS = ["start_time", "open", "high", "low", "close", "volume", "end_time", "volume_usd", "n_trades", "taker_volume", "taker_volume_usd"]
+KLINE_DTYPES = {
+    "start_time": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "end_time": np.int64,
+    "volume_usd": np.float64,
+    "n_trades": np.int64,
+    "taker_volume": np.float64,
+    "taker_volume_usd": np.float64,
+}
+OHLC_COLUMNS = ["timestamp", "open", "high", "low", "close"]
+OHLC_DTYPES = {
+    "timestamp": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+}
+
+FEATURE_DTYPES = {"float64": np.float64, "float32": np.float32}
+if FEATURE_DTYPE_NAME not in FEATURE_DTYPES:
+    raise ValueError(f"Unsupported feature dtype: {FEATURE_DTYPE_NAME}")
+FEATURE_DTYPE = np.dtype(FEATURE_DTYPES[FEATURE_DTYPE_NAME])
+
+
+def _typed_frame(rows, columns, dtypes):
+    # One object array for the whole payload, then one C-level cast per column
+    if len(rows):
+        raw = np.asarray(rows, dtype=object)[:, :len(columns)]
+    else:
+        raw = np.empty((0, len(columns)), dtype=object)
+    return pd.DataFrame({column: raw[:, i].astype(dtypes[column]) for i, column in enumerate(columns)})
+
+
+def klines_frame(rows):
+    """Frame of Binance kline rows (the REST `/api/v3/klines` layout), dated by candle close."""
+    df = _typed_frame(rows, KLINE_COLUMNS, KLINE_DTYPES)
+    df["date"] = pd.to_datetime(df["end_time"] + 1, unit="ms")
+    return df
+
+
+def ohlc_frame(rows):
+    """Frame of CoinGecko OHLC rows."""
+    df = _typed_frame(rows, OHLC_COLUMNS, OHLC_DTYPES)
+    df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
+    return df
@@ -0,0 +1,122 @@
+import math
+import time
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import ParameterGrid, TimeSeriesSplit
+
+SEARCH_STRATEGIES = ["grid", "halving"]
+
+
+class FoldCache:
+    """TimeSeriesSplit indices per sample size, computed once and shared by every candidate."""
+
+    def __init__(self, n_splits=5):
+        self.n_splits = n_splits
+        self._folds = {}
+
+    def get(self, n_rows):
+        if n_rows not in self._folds:
+            self._folds[n_rows] = list(TimeSeriesSplit(n_splits=self.n_splits).split(np.empty((n_rows, 1))))
+        return self._folds[n_rows]
+
+
+def _fit_fold(estimator, params, X, y, train_idx, test_idx):
+    start = time.perf_counter()
+    model = clone(estimator).set_params(**params)
+    try:
+        model.fit(X[train_idx], y[train_idx])
+        mae = mean_absolute_error(y[test_idx], model.predict(X[test_idx]))
+    except ValueError:
+        # e.g. KNN predicting with more neighbours than training rows in a small fold
+        mae = np.inf
+    return mae, time.perf_counter() - start
+
+
+def evaluate(parallel, estimator, candidates, X, y, n_rows, folds):
+    """Mean cross-validated MAE of each of `candidates` on the most recent `n_rows` rows.
+
+    Every (candidate, fold) pair is one task of the same `parallel` call, so all
+    workers are busy however the candidates and folds compare to the core count.
+    Returns one (MAE, seconds spent fitting its folds) per candidate.
+    """
+    X_sub, y_sub = X[-n_rows:], y[-n_rows:]
+    splits = folds.get(n_rows)
+    results = parallel(
+        delayed(_fit_fold)(estimator, params, X_sub, y_sub, train_idx, test_idx)
+        for params in candidates
+        for train_idx, test_idx in splits
+    )
+    per_candidate = [results[i:i + len(splits)] for i in range(0, len(results), len(splits))]
+    return [(float(np.mean([mae for mae, _ in scores])), sum(seconds for _, seconds in scores)) for scores in per_candidate]
+
+
+def order_candidates(param_grid, warm_start_params=None):
+    """Expand the grid, putting the previously best parameters first so they are always evaluated."""
+    candidates = list(ParameterGrid(param_grid))
+    if warm_start_params:
+        warm = {key: warm_start_params[key] for key in param_grid if key in warm_start_params}
+        candidates = [warm] + [c for c in candidates if c != warm]
+    return candidates
+
+
+def search(estimator, param_grid, X, y, strategy="grid", budget_seconds=None, warm_start_params=None,
+           n_splits=5, factor=3, min_rows=3000, n_jobs=-1):
+    """Pick hyperparameters for `estimator` by time-series cross-validated MAE.
+
+    `grid` scores every candidate on all rows. `halving` runs successive halving:
+    all candidates are scored on a small, most recent slice of the rows, the best
+    1/`factor` move on to a slice `factor` times larger, and so on until the
+    survivors are scored on all rows. Candidates are scored in batches that give
+    every one of the `n_jobs` workers a fold; once `budget_seconds` is spent no
+    new batch is started and the best candidate scored on the most rows wins.
+
+    Returns (best params, report), where the report lists every evaluation with
+    its row count, MAE and the seconds spent fitting its folds.
+    """
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unsupported search strategy: {strategy}")
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n_rows = len(X)
+    candidates = order_candidates(param_grid, warm_start_params)
+    folds = FoldCache(n_splits)
+    deadline = time.monotonic() + budget_seconds if budget_seconds else None
+    batch_size = math.ceil(effective_n_jobs(n_jobs) / n_splits)
+
+    rungs = [n_rows]
+    if strategy == "halving" and len(candidates) > 1:
+        # Enough rungs to get from all candidates down to the last `factor` on all rows
+        n_rungs = math.ceil(math.log(len(candidates), factor))
+        first_rows = max(min_rows, n_rows // factor ** (n_rungs - 1))
+        rungs = sorted({min(n_rows, first_rows * factor ** i) for i in range(n_rungs - 1)} | {n_rows})
+
+    report = []
+    best = None
+    start = time.perf_counter()
+    # One pool of workers for every rung and batch
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung, rung_rows in enumerate(rungs):
+            scored = []
+            for batch_start in range(0, len(candidates), batch_size):
+                if deadline is not None and time.monotonic() > deadline and (scored or best is not None):
+                    print(f"Search budget of {budget_seconds}s spent, stopping")
+                    break
+                batch = candidates[batch_start:batch_start + batch_size]
+                for params, (mae, seconds) in zip(batch, evaluate(parallel, estimator, batch, X, y, rung_rows, folds)):
+                    scored.append((mae, params))
+                    report.append({"params": params, "rung": rung, "rows": rung_rows, "mae": mae, "seconds": round(seconds, 3)})
+                    print(f"  rung {rung} rows {rung_rows}: {params} MAE {mae:.6f} in {seconds:.2f}s")
+            if not scored:
+                break
+            scored.sort(key=lambda item: item[0])
+            best = scored[0][1]
+            if len(scored) < len(candidates):
+                break
+            candidates = [params for _, params in scored[:max(1, math.ceil(len(scored) / factor))]]
+            if len(candidates) == 1:
+                break
+
+    print(f"Search ({strategy}) evaluated {len(report)} candidates in {time.perf_counter() - start:.2f}s, best: {best}")
+    return best, report
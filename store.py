@@ -0,0 +1,265 @@
+"""Storage for the formatted training data.
+
+`format_data` writes the feature matrix and target in one of these formats,
+selected with TRAINING_DATA_FORMAT:
+
+- ``npy`` (default): raw feature matrix in FEATURE_DTYPE (float64 unless
+  configured), float64 target matrix (one column per topic target, see
+  topics.py) and int64 timestamps in
+  ``data/training``, described by a small JSON manifest and memory-mapped by
+  `read_training_data` without parsing or copying. New days are appended in
+  place by `append_training_data`.
+- ``parquet``: columnar file, needs pyarrow installed.
+- ``csv``: the original ``price_data.csv`` with every column, kept for export.
+
+Existing ``price_data.csv`` files are migrated to the configured format the
+first time they are read, or explicitly with ``python store.py migrate``.
+"""
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from features import FEATURES
+from topics import TARGETS
+from schema import FEATURE_DTYPE
+from config import data_base_path, TRAINING_DATA_FORMAT
+
+TRAINING_DATA_FORMATS = ["npy", "parquet", "csv"]
+
+csv_path = os.path.join(data_base_path, "price_data.csv")
+parquet_path = os.path.join(data_base_path, "price_data.parquet")
+npy_dir = os.path.join(data_base_path, "training")
+manifest_path = os.path.join(npy_dir, "manifest.json")
+# Running moments of the stored rows kept by TRAINING_MODE=incremental, see incremental.py
+moments_path = os.path.join(npy_dir, "moments.npz")
+
+
+def _check_format(data_format):
+    if data_format not in TRAINING_DATA_FORMATS:
+        raise ValueError(f"Unsupported training data format: {data_format}")
+
+
+def training_data_path(data_format=TRAINING_DATA_FORMAT):
+    _check_format(data_format)
+    return {"npy": manifest_path, "parquet": parquet_path, "csv": csv_path}[data_format]
+
+
+def training_data_exists(data_format=TRAINING_DATA_FORMAT):
+    return os.path.exists(training_data_path(data_format))
+
+
+def read_manifest():
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _frame_targets(price_df):
+    # A migrated price_data.csv only has the targets of the topics it was formatted for
+    return [target for target in TARGETS if target in price_df.columns]
+
+
+def _write_npy(price_df):
+    os.makedirs(npy_dir, exist_ok=True)
+    previous = read_manifest() if os.path.exists(manifest_path) else None
+    generation = previous["generation"] + 1 if previous else 0
+    suffix = {np.dtype(np.float64): "f64", np.dtype(np.float32): "f32"}[FEATURE_DTYPE]
+    files = {
+        "features": f"features.{generation}.{suffix}",
+        "target": f"target.{generation}.f64",
+        "index": f"index.{generation}.i8",
+    }
+    targets = _frame_targets(price_df)
+    # New files get a new generation, so readers of the old manifest keep a consistent view
+    price_df[FEATURES].to_numpy(dtype=FEATURE_DTYPE).tofile(os.path.join(npy_dir, files["features"]))
+    price_df[targets].to_numpy(dtype=np.float64).tofile(os.path.join(npy_dir, files["target"]))
+    pd.DatetimeIndex(price_df.index).asi8.tofile(os.path.join(npy_dir, files["index"]))
+    _write_manifest({
+        "format": "npy",
+        "generation": generation,
+        "rows": len(price_df),
+        "columns": FEATURES,
+        "dtype": FEATURE_DTYPE.name,
+        "targets": targets,
+        "files": files,
+    })
+    if previous:
+        for name in previous["files"].values():
+            if name not in files.values():
+                os.remove(os.path.join(npy_dir, name))
+
+
+def _append_npy(price_df):
+    manifest = read_manifest()
+    last = stored_last_timestamp()
+    if last is not None and len(price_df) and price_df.index[0] <= last:
+        raise ValueError(f"Rows to append start at {price_df.index[0]}, not after the stored {last}")
+    # Rows are appended before the manifest is updated, so readers never see more rows than were written
+    for key, values in [
+        ("features", price_df[FEATURES].to_numpy(dtype=_stored_dtype(manifest))),
+        ("target", price_df[_stored_targets(manifest)].to_numpy(dtype=np.float64)),
+        ("index", pd.DatetimeIndex(price_df.index).asi8),
+    ]:
+        with open(os.path.join(npy_dir, manifest["files"][key]), "ab") as f:
+            values.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+    manifest["rows"] += len(price_df)
+    _write_manifest(manifest)
+
+
+def _stored_dtype(manifest):
+    # Stores written before the dtype was recorded are float64
+    return np.dtype(manifest.get("dtype", "float64"))
+
+
+def _stored_targets(manifest):
+    # Stores written before multiple topics hold the single column named by "target"
+    return manifest.get("targets") or [manifest["target"]]
+
+
+def stored_last_timestamp():
+    """Timestamp of the newest row in the npy store, or None if it cannot be appended to."""
+    if not os.path.exists(manifest_path):
+        return None
+    manifest = read_manifest()
+    if (manifest["columns"] != FEATURES or _stored_targets(manifest) != TARGETS
+            or _stored_dtype(manifest) != FEATURE_DTYPE or manifest["rows"] == 0):
+        return None
+    with open(os.path.join(npy_dir, manifest["files"]["index"]), "rb") as f:
+        f.seek((manifest["rows"] - 1) * 8)
+        return pd.Timestamp(int(np.frombuffer(f.read(8), dtype=np.int64)[0]))
+
+
+def append_training_data(price_df):
+    """Append rows newer than the stored ones to the npy store."""
+    _append_npy(price_df)
+    print(f"Appended {len(price_df)} rows to {manifest_path}")
+
+
+def write_training_data(price_df, data_format=TRAINING_DATA_FORMAT):
+    """Persist the formatted frame (FEATURES + TARGETS, DatetimeIndex) in `data_format`."""
+    _check_format(data_format)
+    os.makedirs(data_base_path, exist_ok=True)
+    if data_format == "npy":
+        _write_npy(price_df)
+    elif data_format == "parquet":
+        price_df[FEATURES + _frame_targets(price_df)].astype({feature: FEATURE_DTYPE for feature in FEATURES}).to_parquet(parquet_path)
+    else:
+        price_df.to_csv(csv_path, date_format='%Y-%m-%d %H:%M:%S')
+    print(f"Data saved to {training_data_path(data_format)}")
+
+
+def _read_npy():
+    manifest = read_manifest()
+    if manifest["columns"] != FEATURES:
+        raise ValueError(f"Training store at {npy_dir} was written with different features, re-run format_data")
+    targets = _stored_targets(manifest)
+    rows = manifest["rows"]
+    files = {key: os.path.join(npy_dir, name) for key, name in manifest["files"].items()}
+    if rows == 0:
+        X, y, index = np.empty((0, len(FEATURES)), dtype=_stored_dtype(manifest)), np.empty((0, len(targets))), np.empty(0, dtype="datetime64[ns]")
+    else:
+        X = np.memmap(files["features"], dtype=_stored_dtype(manifest), mode="r", shape=(rows, len(FEATURES)))
+        y = np.memmap(files["target"], dtype=np.float64, mode="r", shape=(rows, len(targets)))
+        index = np.memmap(files["index"], dtype=np.int64, mode="r", shape=(rows,)).view("datetime64[ns]")
+    index = pd.DatetimeIndex(index, name="date")
+    return pd.DataFrame(X, index=index, columns=FEATURES, copy=False), pd.DataFrame(y, index=index, columns=targets, copy=False), index
+
+
+def read_training_csv(path=csv_path, dtype=FEATURE_DTYPE):
+    """Read the features and targets of a price_data.csv with explicit dtypes.
+
+    Only the date, feature and target columns are parsed; the raw price columns
+    format_data also writes are skipped.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    missing_features = [f for f in FEATURES if f not in header]
+    if missing_features:
+        raise ValueError(f"Missing features in data: {missing_features}")
+    targets = [target for target in TARGETS if target in header]
+    columns = ["date"] + FEATURES + targets
+    dtypes = {feature: dtype for feature in FEATURES}
+    dtypes.update({target: np.float64 for target in targets})
+    df = pd.read_csv(path, usecols=columns, dtype=dtypes, index_col="date")
+    df.index = pd.to_datetime(df.index, format="ISO8601")
+    df.ffill(inplace=True)
+    df.bfill(inplace=True)
+    return df[FEATURES + targets]
+
+
+def _read_frame(data_format):
+    if data_format == "parquet":
+        df = pd.read_parquet(parquet_path)
+        missing_features = [f for f in FEATURES if f not in df.columns]
+        if missing_features:
+            raise ValueError(f"Missing features in data: {missing_features}")
+        return df[FEATURES + [target for target in TARGETS if target in df.columns]]
+    return read_training_csv(csv_path)
+
+
+def migrate_csv(data_format=TRAINING_DATA_FORMAT):
+    """Convert an existing price_data.csv into `data_format`."""
+    print(f"Migrating {csv_path} to {data_format} training store...")
+    write_training_data(_read_frame("csv"), data_format)
+
+
+def read_training_data(data_format=TRAINING_DATA_FORMAT, days=None):
+    """Return (X, y, index) for training; X and y wrap memory maps for the npy format.
+
+    y has one column per stored target; a store written for other topics may
+    lack some of TARGETS, which `model.load_frame` reports. With `days`, only
+    rows within that many days of the newest row are returned.
+    """
+    _check_format(data_format)
+    if not training_data_exists(data_format) and data_format != "csv" and os.path.exists(csv_path):
+        migrate_csv(data_format)
+    print(f"Loading data from {training_data_path(data_format)}...")
+    if data_format == "npy":
+        X, y, index = _read_npy()
+    else:
+        df = _read_frame(data_format)
+        X, y, index = df[FEATURES], df.drop(columns=FEATURES), df.index
+    if days is not None:
+        start = window_start(index, days)
+        X, y, index = X.iloc[start:], y.iloc[start:], index[start:]
+    return X, y, index
+
+
+def window_start(index, days):
+    """Position of the first row of `index` within `days` days of its newest row."""
+    if not len(index):
+        return 0
+    return int(index.searchsorted(index[-1] - pd.Timedelta(days=int(days)), side="right"))
+
+
+def export_csv(path, data_format=TRAINING_DATA_FORMAT):
+    """Write the stored features and targets to a CSV file at `path`."""
+    X, y, _ = read_training_data(data_format)
+    df = pd.concat([X, y], axis=1)
+    df.index.name = "date"
+    df.to_csv(path, date_format='%Y-%m-%d %H:%M:%S')
+    print(f"Exported {len(df)} rows to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the training data store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert price_data.csv to the configured format")
+    migrate_parser.add_argument("--format", default=TRAINING_DATA_FORMAT, choices=TRAINING_DATA_FORMATS)
+    export_parser = subparsers.add_parser("export", help="Export the training store to CSV")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", default=TRAINING_DATA_FORMAT, choices=TRAINING_DATA_FORMATS)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_csv(args.format)
+    else:
+        export_csv(args.path, args.format)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from schema import klines_frame
+from metrics import span
+from topics import PAIRS
+from config import REGION, LIVE_STREAM_MAX_AGE, BINANCE_API_URL, BINANCE_WS_URL
+
+BUFFER_SIZE = 1000
+MAX_BACKOFF_SECONDS = 30
+
+
+class StreamNotReady(RuntimeError):
+    """The candle buffers are not seeded or have not heard from the exchange recently."""
+
+
+class CandleBuffer:
+    """The newest `size` 1m klines of one pair, in Binance REST row format.
+
+    Rows are keyed by candle start time, so a websocket update of the open candle
+    replaces it and the first update of a new candle appends it. Candles arrive in
+    time order, which keeps the dict ordered oldest first.
+    """
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._rows = {}
+        self.updated_at = None
+
+    def seed(self, rows):
+        with self._lock:
+            self._rows = {int(row[0]): row for row in rows[-self.size:]}
+            self.updated_at = time.time()
+
+    def update(self, kline):
+        row = [kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"], kline["T"], kline["q"], kline["n"], kline["V"], kline["Q"], "0"]
+        with self._lock:
+            if self._rows and row[0] < next(iter(self._rows)):
+                return
+            self._rows[row[0]] = row
+            while len(self._rows) > self.size:
+                del self._rows[next(iter(self._rows))]
+            self.updated_at = time.time()
+
+    def rows(self):
+        with self._lock:
+            return list(self._rows.values())
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class MarketStream:
+    """Live klines for `pairs` kept current from the Binance kline websocket.
+
+    A daemon thread runs an asyncio loop that connects to the combined
+    `<pair>@kline_1m` stream, seeds every buffer from the REST klines endpoint
+    once the socket is open (so no candle falls between the snapshot and the
+    stream) and then applies each kline update. A dropped connection is retried
+    with jittered exponential backoff and the buffers are reseeded on every
+    reconnect. `frames` reads only local memory and raises StreamNotReady while
+    the data cannot be trusted, so callers can fall back to REST.
+    """
+
+    def __init__(self, pairs, region=REGION, api_url=BINANCE_API_URL, ws_url=BINANCE_WS_URL,
+                 buffer_size=BUFFER_SIZE, max_age=LIVE_STREAM_MAX_AGE):
+        self.pairs = list(pairs)
+        self.api_url = api_url.format(region=region)
+        self.ws_url = ws_url.format(region=region)
+        self.max_age = max_age
+        self.buffers = {pair: CandleBuffer(buffer_size) for pair in self.pairs}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._loop = None
+        self._task = None
+        self.connected = False
+        self.connects = 0
+        self.messages = 0
+        self.last_error = None
+
+    def ensure_started(self):
+        # Threads do not survive a fork, so a preforked worker starts its own
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self.connected = False
+            self._thread = threading.Thread(target=self._run_loop, name="market-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._run())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    @property
+    def stream_url(self):
+        streams = "/".join(f"{pair.lower()}@kline_1m" for pair in self.pairs)
+        return f"{self.ws_url}/stream?streams={streams}"
+
+    async def _seed(self, session):
+        async def seed_pair(pair):
+            url = f"{self.api_url}/api/v3/klines"
+            params = {"symbol": pair, "interval": "1m", "limit": str(self.buffers[pair].size)}
+            async with session.get(url, params=params) as response:
+                response.raise_for_status()
+                self.buffers[pair].seed(await response.json())
+
+        await asyncio.gather(*(seed_pair(pair) for pair in self.pairs))
+
+    def _handle(self, message):
+        data = message.get("data", message)
+        kline = data.get("k")
+        if kline is None:
+            return
+        buffer = self.buffers.get(kline["s"])
+        if buffer is not None:
+            buffer.update(kline)
+            self.messages += 1
+
+    async def _run(self):
+        # Only nodes with LIVE_DATA_SOURCE=stream pay for importing aiohttp
+        import aiohttp
+        backoff = 1
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=None)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                try:
+                    async with session.ws_connect(self.stream_url, heartbeat=30) as ws:
+                        await self._seed(session)
+                        self.connected = True
+                        self.connects += 1
+                        backoff = 1
+                        print(f"Market stream connected, buffers seeded for {self.pairs}")
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self._handle(json.loads(msg.data))
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                        self.last_error = "connection closed"
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.last_error = str(e) or type(e).__name__
+                self.connected = False
+                delay = backoff * random.uniform(0.5, 1.0)
+                print(f"Market stream disconnected ({self.last_error}), reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    def frames(self):
+        """Return {pair: live kline frame} from the local buffers, shaped like the REST fetch."""
+        now = time.time()
+        for pair, buffer in self.buffers.items():
+            if not self.connected or buffer.updated_at is None:
+                raise StreamNotReady(f"{pair} stream is not connected")
+            if now - buffer.updated_at > self.max_age:
+                raise StreamNotReady(f"{pair} stream silent for {now - buffer.updated_at:.0f}s")
+        with span("parse"):
+            return {pair: klines_frame(buffer.rows()) for pair, buffer in self.buffers.items()}
+
+    def stats(self):
+        now = time.time()
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "messages": self.messages,
+            "last_error": self.last_error,
+            "buffers": {
+                pair: {
+                    "candles": len(buffer),
+                    "age_seconds": round(now - buffer.updated_at, 3) if buffer.updated_at else None,
+                }
+                for pair, buffer in self.buffers.items()
+            },
+        }
+
+
+market_stream = MarketStream(PAIRS)
@@ -0,0 +1,78 @@
+import re
+from collections import namedtuple
+from config import TOPICS as TOPICS_SPEC
+
+# Pairs every model sees as features, in the original feature order; topic pairs are added after them
+BASE_PAIRS = ["ETHUSDT", "BTCUSDT"]
+HORIZON_UNITS = {"m": 1, "h": 60, "d": 1440}
+DEFAULT_HORIZON = "6h"
+
+
+class Topic(namedtuple("Topic", ["token", "horizon", "model"])):
+    """One served prediction: volatility of `token` over `horizon` from a `model` regressor."""
+
+    @property
+    def pair(self):
+        return f"{self.token}USDT"
+
+    @property
+    def key(self):
+        return f"{self.token}-{self.horizon}-{self.model}"
+
+    @property
+    def window(self):
+        """Horizon in 1m candles."""
+        return horizon_minutes(self.horizon)
+
+    @property
+    def target(self):
+        # The original single-topic target keeps its column name
+        if self.horizon == DEFAULT_HORIZON:
+            return f"target_{self.pair}"
+        return f"target_{self.pair}_{self.horizon}"
+
+
+def horizon_minutes(horizon):
+    match = re.fullmatch(r"(\d+)([mhd])", horizon)
+    if not match:
+        raise ValueError(f"Unsupported horizon: {horizon}")
+    return int(match.group(1)) * HORIZON_UNITS[match.group(2)]
+
+
+def parse_topics(spec):
+    topics = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        parts = [part.strip() for part in entry.split(":")]
+        if len(parts) != 3:
+            raise ValueError(f"Topic must be token:horizon:model, got {entry!r}")
+        topic = Topic(parts[0].upper(), parts[1].lower(), parts[2])
+        horizon_minutes(topic.horizon)
+        if topic in topics:
+            raise ValueError(f"Duplicate topic {entry!r}")
+        topics.append(topic)
+    if not topics:
+        raise ValueError("At least one topic is required")
+    return topics
+
+
+def topic_pairs(topics):
+    pairs = list(BASE_PAIRS)
+    for topic in topics:
+        if topic.pair not in pairs:
+            pairs.append(topic.pair)
+    return pairs
+
+
+def find_topic(token, horizon=None, topics=None):
+    """The topic serving `token` (and `horizon` if given), or None."""
+    for topic in topics or TOPICS:
+        if topic.token == token.upper() and (horizon is None or topic.horizon == horizon.lower()):
+            return topic
+    return None
+
+
+TOPICS = parse_topics(TOPICS_SPEC)
+PAIRS = topic_pairs(TOPICS)
+TARGETS = list(dict.fromkeys(topic.target for topic in TOPICS))
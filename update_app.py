@@ -1,22 +1,37 @@
 import os
+import time
 import requests
 
 inference_address = os.environ["INFERENCE_API_ADDRESS"]
 url = f"{inference_address}/update"
+poll_seconds = int(os.getenv("UPDATE_POLL_SECONDS", default=15))
 
 print("UPDATING INFERENCE WORKER DATA")
 
 response = requests.get(url)
-if response.status_code == 200:
-    # Request was successful
-    content = response.text
-
-    if content == "0":
-        print("Response content is '0'")
-        exit(0)
-    else:
-        exit(1)
-else:
+if response.status_code != 202:
     # Request failed
     print(f"Request failed with status code: {response.status_code}")
     exit(1)
+
+job_id = response.json()["id"]
+print(f"Update job {job_id} queued")
+
+# The update runs in the background on the inference node; poll until it finishes
+while True:
+    time.sleep(poll_seconds)
+    try:
+        response = requests.get(f"{url}/status/{job_id}", timeout=10)
+    except requests.RequestException as e:
+        print(f"Status request failed: {str(e)}")
+        continue
+    if response.status_code != 200:
+        print(f"Request failed with status code: {response.status_code}")
+        exit(1)
+    status = response.json()
+    if status["status"] == "succeeded":
+        print(f"Update job {job_id} succeeded")
+        exit(0)
+    if status["status"] == "failed":
+        print(f"Update job {job_id} failed: {status.get('error')}")
+        exit(1)
@@ -1,13 +1,20 @@
+import hashlib
 import os
+from collections import namedtuple
 from datetime import date, timedelta
 import pathlib
+import threading
 import time
+import zipfile
+from urllib.parse import urlsplit
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
-from concurrent.futures import ThreadPoolExecutor
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait
 import json
+from schema import klines_frame, ohlc_frame
+from metrics import span
+from config import BINANCE_API_URL, BINANCE_DATA_URL, DOWNLOAD_WORKERS, DOWNLOAD_CONCURRENCY_PER_HOST
 
 
 # Define the retry strategy
@@ -17,46 +24,183 @@ retry_strategy = Retry(
     status_forcelist=[429, 500, 502, 503, 504],  # HTTP status codes to retry on
 )
 
-# Create an HTTP adapter with the retry strategy and mount it to session
-adapter = HTTPAdapter(max_retries=retry_strategy)
+# Create an HTTP adapter with the retry strategy and mount it to session; its pool
+# holds a connection for every download allowed to run against one host
+adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=DOWNLOAD_CONCURRENCY_PER_HOST)
 
 # Create a new session object
 session = requests.Session()
 session.mount('http://', adapter)
 session.mount('https://', adapter)
 
+# Live fetches sit on the request path, so they retry once at most and share a
+# connection pool sized for every pair being fetched in parallel
+live_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=1, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504]),
+)
+live_session = requests.Session()
+live_session.mount('http://', live_adapter)
+live_session.mount('https://', live_adapter)
+live_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="live-fetch")
+
+
+CHUNK_SIZE = 1 << 20
+DOWNLOAD_ATTEMPTS = 3
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+
+def _host_limit(url):
+    host = urlsplit(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(DOWNLOAD_CONCURRENCY_PER_HOST)
+        return _host_limits[host]
+
+
+DownloadResult = namedtuple("DownloadResult", ["url", "path", "status", "bytes", "seconds", "error"])
+
+
+class DownloadReport:
+    """Results of one batch of downloads.
+
+    `status` of each result is one of downloaded, resumed, exists, missing or failed.
+    """
+
+    def __init__(self, results=None):
+        self.results = list(results or [])
+
+    @property
+    def files(self):
+        """Paths of the files this batch wrote."""
+        return sorted(r.path for r in self.results if r.status in ("downloaded", "resumed"))
+
+    @property
+    def bytes(self):
+        return sum(r.bytes for r in self.results)
+
+    def count(self, status):
+        return sum(1 for r in self.results if r.status == status)
+
+    def __len__(self):
+        return len(self.files)
+
+    def summary(self, seconds=None):
+        counts = ", ".join(f"{self.count(status)} {status}" for status in ["downloaded", "resumed", "exists", "missing", "failed"] if self.count(status))
+        rate = f" at {self.bytes / seconds / 2**20:.1f} MiB/s" if seconds else ""
+        return f"{counts or 'nothing to do'}; {self.bytes / 2**20:.1f} MiB{rate}"
+
+
+def _is_complete(file_name):
+    # Zips written by older versions may be truncated; a zip without its central directory is not complete
+    if file_name.endswith(".zip"):
+        return zipfile.is_zipfile(file_name)
+    return os.path.getsize(file_name) > 0
 
-files = []
-
-
-# Function to download the URL, called asynchronously by several child processes
-def download_url(url, download_path, name=None):
-    try:
-        global files
-        if name:
-            file_name = os.path.join(download_path, name)
-        else:
-            file_name = os.path.join(download_path, os.path.basename(url))
-        dir_path = os.path.dirname(file_name)
-        pathlib.Path(dir_path).mkdir(parents=True, exist_ok=True) 
-        if os.path.isfile(file_name):
-            # print(f"{file_name} already exists")
-            return
-        # Make a request using the session object
-        response = session.get(url)
+
+def _fetch_checksum(checksum_url):
+    response = session.get(checksum_url, timeout=(10, 30))
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.text.split()[0].lower()
+
+
+def _stream_to_part(url, part_name):
+    """Append the rest of `url` to `part_name`, resuming from its current size. Returns bytes received."""
+    offset = os.path.getsize(part_name) if os.path.exists(part_name) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+        if response.status_code == 416:
+            # The part already holds the whole file
+            return 0
         if response.status_code == 404:
+            raise FileNotFoundError(url)
+        response.raise_for_status()
+        if response.status_code == 200:
+            # Either a fresh download or the server ignored the Range header
+            offset = 0
+        expected = response.headers.get("Content-Length")
+        received = 0
+        with open(part_name, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                received += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        if expected is not None and received != int(expected):
+            raise IOError(f"Received {received} of {expected} bytes")
+        return received
+
+
+def _sha256(file_name):
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to download the URL, called concurrently by several threads
+def download_url(url, download_path, name=None, checksum_url=None):
+    """Download `url` into `download_path` and return a DownloadResult.
+
+    The body is streamed to `<file>.part` and renamed into place only once it
+    is complete and, when `checksum_url` is given and exists, its sha256
+    matches. An interrupted download keeps its part file and the next attempt
+    (or the next run) resumes it with a Range request. At most
+    DOWNLOAD_CONCURRENCY_PER_HOST downloads run against one host at a time.
+    """
+    start = time.perf_counter()
+    if name:
+        file_name = os.path.join(download_path, name)
+    else:
+        file_name = os.path.join(download_path, os.path.basename(url))
+    part_name = f"{file_name}.part"
+    pathlib.Path(os.path.dirname(file_name)).mkdir(parents=True, exist_ok=True)
+    if os.path.isfile(file_name):
+        if _is_complete(file_name):
+            return DownloadResult(url, file_name, "exists", 0, time.perf_counter() - start, None)
+        print(f"Replacing incomplete file {file_name}")
+        os.remove(file_name)
+
+    with _host_limit(url):
+        try:
+            expected_sha256 = _fetch_checksum(checksum_url) if checksum_url else None
+            resumed = os.path.exists(part_name) and os.path.getsize(part_name) > 0
+            received = 0
+            for attempt in range(DOWNLOAD_ATTEMPTS):
+                try:
+                    received += _stream_to_part(url, part_name)
+                    break
+                except FileNotFoundError:
+                    raise
+                except (requests.RequestException, IOError) as e:
+                    if attempt == DOWNLOAD_ATTEMPTS - 1:
+                        raise
+                    resumed = True
+                    print(f"Download of {url} interrupted ({str(e)}), resuming")
+            if expected_sha256 is not None and _sha256(part_name) != expected_sha256:
+                os.remove(part_name)
+                raise ValueError(f"Checksum mismatch for {url}")
+            os.replace(part_name, file_name)
+            status = "resumed" if resumed else "downloaded"
+            return DownloadResult(url, file_name, status, received, time.perf_counter() - start, None)
+        except FileNotFoundError:
             print(f"File does not exist: {url}")
-        elif response.status_code == 200:
-            with open(file_name, 'wb') as f:
-                f.write(response.content)
-            # print(f"Downloaded: {url} to {file_name}")
-            files.append(file_name)
-            return
-        else:
-            print(f"Failed to download {url}")
-            return
-    except Exception as e:
-        print(str(e))
+            return DownloadResult(url, file_name, "missing", 0, time.perf_counter() - start, None)
+        except Exception as e:
+            print(f"Failed to download {url}: {str(e)}")
+            return DownloadResult(url, file_name, "failed", 0, time.perf_counter() - start, str(e))
+
+
+def download_many(jobs):
+    """Run download_url(**job) for every job in parallel and return a DownloadReport."""
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download") as executor:
+        return DownloadReport(executor.map(lambda job: download_url(**job), jobs))
 
 
 # Function to generate a range of dates
@@ -66,41 +210,48 @@ def daterange(start_date, end_date):
 
 
 # Function to download daily data from Binance
-def download_binance_daily_data(pair, training_days, region, download_path):
-    base_url = f"https://data.binance.vision/data/spot/daily/klines"
+def download_binance_daily_data(pair, training_days, region, download_path, data_url=BINANCE_DATA_URL):
+    base_url = f"{data_url}/data/spot/daily/klines"
 
     end_date = date.today()
     start_date = end_date - timedelta(days=int(training_days))
-    
-    global files
-    files = []
-
-    with ThreadPoolExecutor() as executor:
-        print(f"Downloading data for {pair}")
-        for single_date in daterange(start_date, end_date):
-            url = f"{base_url}/{pair}/1m/{pair}-1m-{single_date}.zip"
-            executor.submit(download_url, url, download_path)
-    
-    return files
 
-
-def download_binance_current_day_data(pair, region):
+    print(f"Downloading data for {pair}")
+    jobs = []
+    for single_date in daterange(start_date, end_date):
+        url = f"{base_url}/{pair}/1m/{pair}-1m-{single_date}.zip"
+        jobs.append({"url": url, "download_path": download_path, "checksum_url": f"{url}.CHECKSUM"})
+    start = time.perf_counter()
+    report = download_many(jobs)
+    print(f"{pair}: {report.summary(time.perf_counter() - start)}")
+    return report
+
+
+def fetch_concurrently(jobs, deadline):
+    """Run the callables in `jobs` (name -> callable) in parallel and return name -> result.
+
+    Raises TimeoutError if they have not all finished within `deadline` seconds.
+    """
+    futures = {name: live_executor.submit(job) for name, job in jobs.items()}
+    _, not_done = wait(futures.values(), timeout=deadline)
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        pending = [name for name, future in futures.items() if future in not_done]
+        raise TimeoutError(f"Live data fetch exceeded {deadline}s deadline waiting for {pending}")
+    return {name: future.result() for name, future in futures.items()}
+
+
+def download_binance_current_day_data(pair, region, timeout=None):
     limit = 1000
-    base_url = f'https://api.binance.{region}/api/v3/klines?symbol={pair}&interval=1m&limit={limit}'
+    base_url = f'{BINANCE_API_URL.format(region=region)}/api/v3/klines?symbol={pair}&interval=1m&limit={limit}'
 
     # Make a request using the session object
-    response = session.get(base_url)
+    response = live_session.get(base_url, timeout=timeout)
     response.raise_for_status()
-    resp = str(response.content, 'utf-8').rstrip()
-
-    columns = ['start_time','open','high','low','close','volume','end_time','volume_usd','n_trades','taker_volume','taker_volume_usd','ignore']
-    
-    df = pd.DataFrame(json.loads(resp),columns=columns)
-    df['date'] = [pd.to_datetime(x+1,unit='ms') for x in df['end_time']]
-    df['date'] = df['date'].apply(pd.to_datetime)
-    df[["volume", "taker_volume", "open", "high", "low", "close"]] = df[["volume", "taker_volume", "open", "high", "low", "close"]].apply(pd.to_numeric)
-
-    return df.sort_index()
+    with span("parse"):
+        resp = str(response.content, 'utf-8').rstrip()
+        return klines_frame(json.loads(resp))
 
 
 def get_coingecko_coin_id(token):
@@ -143,33 +294,20 @@ def download_coingecko_data(token, training_days, download_path, CG_API_KEY):
     # Get OHLC data from Coingecko
     url = f'https://api.coingecko.com/api/v3/coins/{coin_id}/ohlc?vs_currency=usd&days={days}&api_key={CG_API_KEY}'
 
-    global files
-    files = []
+    print(f"Downloading data for {coin_id}")
+    name = os.path.basename(url).split("?")[0].replace("/", "_") + ".json"
+    return download_many([{"url": url, "download_path": download_path, "name": name}])
 
-    with ThreadPoolExecutor() as executor:
-        print(f"Downloading data for {coin_id}")
-        name = os.path.basename(url).split("?")[0].replace("/", "_") + ".json"
-        executor.submit(download_url, url, download_path, name)
-    
-    return files
 
-
-def download_coingecko_current_day_data(token, CG_API_KEY):
+def download_coingecko_current_day_data(token, CG_API_KEY, timeout=None):
     coin_id = get_coingecko_coin_id(token)
     print(f"Coin ID: {coin_id}")
 
     url = f'https://api.coingecko.com/api/v3/coins/{coin_id}/ohlc?vs_currency=usd&days=1&api_key={CG_API_KEY}'
 
     # Make a request using the session object
-    response = session.get(url)
+    response = live_session.get(url, timeout=timeout)
     response.raise_for_status()
-    resp = str(response.content, 'utf-8').rstrip()
-
-    columns = ['timestamp','open','high','low','close']
-    
-    df = pd.DataFrame(json.loads(resp), columns=columns)
-    df['date'] = [pd.to_datetime(x,unit='ms') for x in df['timestamp']]
-    df['date'] = df['date'].apply(pd.to_datetime)
-    df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].apply(pd.to_numeric)
-
-    return df.sort_index()
+    with span("parse"):
+        resp = str(response.content, 'utf-8').rstrip()
+        return ohlc_frame(json.loads(resp))